@@ -0,0 +1,92 @@
+"""Per-request auth overhead of the chat routes, refresh cookie versus JWT.
+
+The `jwt` scenario is `parse_jwt_user_data` on a signed access token: a
+signature and claims check in process, nothing else, so it runs anywhere. The
+`refresh` scenario is `valid_refresh_token`, which is how the chat routes
+authenticated before, with the refresh-token cache cleared before every call
+so each request hits the configured database (`DB_*` settings, migrated to
+head); `refresh-cached` lets the cache answer. The seeded user and token are
+deleted afterwards. Pass `--jwt-only` when no database is available.
+
+    python -m benchmarks.bench_auth --requests 2000
+"""
+
+import time
+import uuid  # type: ignore
+import asyncio
+import argparse
+import statistics
+
+from types import SimpleNamespace  # type: ignore
+
+from sqlalchemy import delete
+
+from src.db import Session, engine
+from src.auth import jwt, service
+from src.auth.models import RefreshToken, User
+from src.auth.dependencies import valid_refresh_token
+
+
+async def jwt_auth(token: str, clear_cache: bool):
+    return await jwt.parse_jwt_user_data(await jwt.parse_jwt_user_data_optional(token))
+
+
+async def refresh_auth(token: str, clear_cache: bool):
+    if clear_cache:
+        await service.refresh_token_cache.delete(service.hash_refresh_token(token))
+    return await valid_refresh_token(token)
+
+
+async def seed() -> tuple[uuid.UUID, str]:
+    async with Session() as db:
+        user = User(email=f"bench-{uuid.uuid4()}@example.com", password="bench")
+        db.add(user)
+        await db.commit()
+        return user.id, await service.create_refresh_token(db, user_id=user.id)
+
+
+async def cleanup(user_id: uuid.UUID):
+    async with Session() as db:
+        await db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+async def run(name: str, auth, token: str, requests: int, clear_cache: bool = False):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await auth(token, clear_cache)
+        timings.append(time.perf_counter() - start)
+
+    print(
+        f"{name:<14} requests={requests:<6} "
+        f"median={statistics.median(timings) * 1e6:9.1f}us "
+        f"p99={statistics.quantiles(timings, n=100)[-1] * 1e6:9.1f}us"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--jwt-only", action="store_true")
+    args = parser.parse_args()
+
+    user = SimpleNamespace(id=uuid.uuid4(), is_admin=False)
+    await run("jwt", jwt_auth, jwt.create_access_token(user=user), args.requests)
+    if args.jwt_only:
+        return
+
+    try:
+        user_id, refresh_token = await seed()
+        try:
+            await run("refresh", refresh_auth, refresh_token, args.requests, True)
+            await run("refresh-cached", refresh_auth, refresh_token, args.requests)
+        finally:
+            await cleanup(user_id)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
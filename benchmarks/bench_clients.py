@@ -0,0 +1,127 @@
+"""Connection reuse of the shared client registry versus per-call clients.
+
+Runs a local keep-alive HTTP server that answers like the chat completions
+endpoint and counts the TCP connections it accepts. The `per-call` scenario
+builds a fresh `AsyncOpenAI` for every request, which is what the call sites
+did before `src.clients`; the `registry` scenario goes through one
+`ClientRegistry`. Against the real API every extra connection is also a TLS
+handshake.
+
+    python -m benchmarks.bench_clients --requests 200 --concurrency 10
+"""
+
+import json
+import time
+import asyncio
+import argparse
+
+from openai import AsyncOpenAI
+
+from src.clients import ClientRegistry
+
+COMPLETION = json.dumps(
+    {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-3.5-turbo-0125",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "ok"},
+                "finish_reason": "stop",
+            }
+        ],
+    }
+).encode()
+
+
+class CountingServer:
+    def __init__(self):
+        self.connections = 0
+        self.server: asyncio.Server | None = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while headers := await reader.readuntil(b"\r\n\r\n"):
+                length = 0
+                for line in headers.decode().split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                await reader.readexactly(length)
+
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Connection: keep-alive\r\n"
+                    + f"Content-Length: {len(COMPLETION)}\r\n\r\n".encode()
+                    + COMPLETION
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/v1"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def complete(client: AsyncOpenAI):
+    await client.chat.completions.create(
+        model="gpt-3.5-turbo-0125", messages=[{"role": "user", "content": "hi"}]
+    )
+
+
+async def per_call(base_url: str):
+    client = AsyncOpenAI(api_key="bench", base_url=base_url)
+    try:
+        await complete(client)
+    finally:
+        await client.close()
+
+
+async def run(name: str, call, requests: int, concurrency: int):
+    server = CountingServer()
+    base_url = await server.start()
+    semaphore = asyncio.Semaphore(concurrency)
+    registry = ClientRegistry(openai_api_key="bench", openai_base_url=base_url)
+
+    async def one():
+        async with semaphore:
+            if call == "per-call":
+                await per_call(base_url)
+            else:
+                await complete(registry.openai)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    await registry.aclose()
+    await server.stop()
+    print(
+        f"{name:<10} requests={requests:<5} connections={server.connections:<5} "
+        f"total={elapsed * 1000:8.1f}ms per_request={elapsed / requests * 1000:6.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    await run("per-call", "per-call", args.requests, args.concurrency)
+    await run("registry", "registry", args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
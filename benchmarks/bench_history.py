@@ -0,0 +1,133 @@
+"""Column-only history loading versus hydrating `ChatMessage` instances.
+
+Seeds a throwaway user and session with N messages in the configured
+database (`DB_*` settings, migrated to head) and times two ways of turning a
+session into LangChain messages. The `orm` scenario selects whole
+`ChatMessage` entities, which is what `Chat.get_all_messages_roles` did; the
+`core` scenario is `load_history_entries`, which selects three columns as
+tuples on the session's connection. The seeded rows are deleted afterwards.
+
+    python -m benchmarks.bench_history --sizes 100 1000 10000 --repeat 20
+"""
+
+import time
+import uuid  # type: ignore
+import asyncio
+import argparse
+import statistics
+
+from datetime import datetime, timedelta  # type: ignore
+
+from sqlalchemy import delete, insert, select
+
+from src.db import Session, engine
+from src.auth.models import User
+from src.chat.chat import load_history_entries
+from src.chat.context import to_langchain_message, to_langchain_messages
+from src.chat.models import ChatMessage, ChatRole, ChatSession
+from src.chat.prompts import CURRENT_SYSTEM_PROMPT_VERSION
+
+ROLES = [ChatRole.USER, ChatRole.ASSISTANT]
+MESSAGE = "How large is the addressable market for B2B sales tooling? " * 4
+
+
+async def orm_history(db, session_id: uuid.UUID, limit: int):
+    stmt = (
+        select(ChatMessage)
+        .where(
+            (ChatMessage.session_id == session_id)
+            & (
+                ChatMessage.role.in_(
+                    [ChatRole.ASSISTANT, ChatRole.USER, ChatRole.SYSTEM]
+                )
+            )
+        )
+        .order_by(ChatMessage.created_at.desc())
+        .limit(limit)
+    )
+    rows = list(reversed((await db.execute(stmt)).scalars().all()))
+    entries = [(row.role.value, row.message, row.created_at) for row in rows]
+    return [to_langchain_message(role, content) for role, content, _ in entries]
+
+
+async def core_history(db, session_id: uuid.UUID, limit: int):
+    return to_langchain_messages(await load_history_entries(db, session_id, limit))
+
+
+async def seed(size: int) -> tuple[uuid.UUID, uuid.UUID]:
+    async with Session() as db:
+        user = User(email=f"bench-{uuid.uuid4()}@example.com", password="bench")
+        db.add(user)
+        await db.flush()
+        chat_session = ChatSession(
+            user_id=user.id, system_prompt_version=CURRENT_SYSTEM_PROMPT_VERSION
+        )
+        db.add(chat_session)
+        await db.flush()
+
+        start = datetime.utcnow() - timedelta(seconds=size)
+        await db.execute(
+            insert(ChatMessage),
+            [
+                {
+                    "user_id": user.id,
+                    "session_id": chat_session.id,
+                    "role": ROLES[i % 2],
+                    "message": MESSAGE,
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in range(size)
+            ],
+        )
+        await db.commit()
+        return user.id, chat_session.id
+
+
+async def cleanup(user_id: uuid.UUID, session_id: uuid.UUID):
+    async with Session() as db:
+        await db.execute(
+            delete(ChatMessage).where(ChatMessage.session_id == session_id)
+        )
+        await db.execute(delete(ChatSession).where(ChatSession.id == session_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+async def run(name: str, load, session_id: uuid.UUID, size: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        # A fresh session each time, as every request gets its own.
+        async with Session() as db:
+            start = time.perf_counter()
+            messages = await load(db, session_id, size)
+            timings.append(time.perf_counter() - start)
+    assert len(messages) == size
+
+    median = statistics.median(timings)
+    print(
+        f"{name:<5} messages={size:<6} median={median * 1000:8.2f}ms "
+        f"min={min(timings) * 1000:8.2f}ms per_message={median / size * 1e6:6.2f}us"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        for size in args.sizes:
+            user_id, session_id = await seed(size)
+            try:
+                await run("orm", orm_history, session_id, size, args.repeat)
+                await run("core", core_history, session_id, size, args.repeat)
+            finally:
+                await cleanup(user_id, session_id)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Chat streaming latency during a login storm, inline bcrypt versus the pool.
+
+Simulated chats stream a token every `--token-interval` seconds on the event
+loop while a burst of concurrent logins checks passwords. The `inline`
+scenario calls `bcrypt_check` on the loop, which is what
+`authenticate_user` did before; the `pool` scenario goes through
+`security.check_password`, which runs bcrypt on the bounded hashing pool and
+rejects logins beyond its queue. A steady chat gap means the loop kept up.
+
+    python -m benchmarks.bench_logins --logins 50 --chats 20
+"""
+
+import time
+import asyncio
+import argparse
+import statistics
+
+from src.auth import security
+from src.auth.exceptions import PasswordHashingBusy
+
+PASSWORD = "correct horse battery staple"
+
+
+async def inline_check(password: str, password_in_db: str) -> bool:
+    return security.bcrypt_check(password, password_in_db)
+
+
+async def stream_chat(interval: float, tokens: int, gaps: list[float]):
+    for _ in range(tokens):
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        gaps.append(time.perf_counter() - start - interval)
+
+
+async def login(check, password_in_db: str, outcomes: list[str]):
+    try:
+        await check(PASSWORD, password_in_db)
+        outcomes.append("ok")
+    except PasswordHashingBusy:
+        outcomes.append("rejected")
+
+
+async def run(name: str, check, password_in_db: str, args: argparse.Namespace):
+    gaps, outcomes = [], []
+    start = time.perf_counter()
+    chats = [
+        asyncio.create_task(stream_chat(args.token_interval, args.tokens, gaps))
+        for _ in range(args.chats)
+    ]
+    # Let the chats settle into their rhythm before the storm hits.
+    await asyncio.sleep(args.token_interval * 2)
+    await asyncio.gather(
+        *(login(check, password_in_db, outcomes) for _ in range(args.logins))
+    )
+    await asyncio.gather(*chats)
+
+    gaps_ms = sorted(gap * 1000 for gap in gaps)
+    print(
+        f"{name:<6} logins={outcomes.count('ok'):<4} "
+        f"rejected={outcomes.count('rejected'):<4} "
+        f"chat_lag p50={statistics.median(gaps_ms):7.1f}ms "
+        f"p99={gaps_ms[int(len(gaps_ms) * 0.99) - 1]:7.1f}ms "
+        f"max={gaps_ms[-1]:7.1f}ms total={time.perf_counter() - start:6.2f}s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    password_in_db = security.bcrypt_hash(PASSWORD)
+    await run("inline", inline_check, password_in_db, args)
+    await run("pool", security.check_password, password_in_db, args)
+    security.shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,11 @@
+import json
 import streamlit as st
 import requests
 
-
 CHAT_START_URL = "http://127.0.0.1:9000/chat/start"
 ADD_MESSAGE_URL = "http://127.0.0.1:9000/chat"
 ALL_CHAT_URL = "http://127.0.0.1:9000/allChat"
+TOKENS_URL = "http://127.0.0.1:9000/users/tokens"
 
 
 def set_cookie_in_header(refresh_token):
@@ -16,10 +17,28 @@ def set_cookie_in_header(refresh_token):
     return {"Cookie": cookie_header}
 
 
-def start_chat(refresh_token):
+def refresh_tokens():
+    headers = set_cookie_in_header(st.session_state.refresh_token)
+    response = requests.put(TOKENS_URL, headers=headers)
+    response.raise_for_status()
+    tokens = response.json()
+    st.session_state.access_token = tokens["access_token"]
+    st.session_state.refresh_token = tokens["refresh_token"]
+
+
+def authorized_request(method, url, **kwargs):
+    # Access tokens are short-lived, get a new one once when it is rejected.
+    for attempt in range(2):
+        headers = {"Authorization": f"Bearer {st.session_state.access_token}"}
+        response = requests.request(method, url, headers=headers, **kwargs)
+        if response.status_code != 401 or attempt:
+            return response
+        refresh_tokens()
+
+
+def start_chat():
     try:
-        headers = set_cookie_in_header(refresh_token)
-        response = requests.post(CHAT_START_URL, headers=headers)
+        response = authorized_request("POST", CHAT_START_URL)
         response.raise_for_status()
         return response
     except requests.RequestException as e:
@@ -28,14 +47,16 @@ def start_chat(refresh_token):
 
 
 def add_message_to_chat(
-    refresh_token, message, is_image=False, image_data=None, stream=False
+    session_id, message, is_image=False, image_data=None, stream=False
 ):
     try:
-        headers = set_cookie_in_header(refresh_token)
-        data = {"message": message, "is_image": is_image, "stream": stream}
+        params = {"session_id": session_id, "is_image": is_image, "streaming": stream}
+        data = {"message": message}
         if is_image:
             data["image_data"] = image_data
-        response = requests.post(ADD_MESSAGE_URL, headers=headers, json=data)
+        response = authorized_request(
+            "POST", ADD_MESSAGE_URL, params=params, json=data, stream=stream
+        )
         response.raise_for_status()
         return response
     except requests.RequestException as e:
@@ -43,10 +64,29 @@ def add_message_to_chat(
         return None
 
 
-def get_all_chat(refresh_token):
+def iter_sse_events(response):
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: ") :]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: ") :])
+
+
+def stream_assistant_message(response, final_message):
+    for event, data in iter_sse_events(response):
+        if event == "token":
+            yield data["content"]
+        elif event == "done":
+            final_message["message"] = data["content"]
+        elif event == "error":
+            st.error(data["detail"])
+
+
+def get_all_chat(session_id):
     try:
-        headers = set_cookie_in_header(refresh_token)
-        response = requests.get(ALL_CHAT_URL, headers=headers)
+        params = {"session_id": session_id}
+        response = authorized_request("GET", ALL_CHAT_URL, params=params)
         response.raise_for_status()
         return response
     except requests.RequestException as e:
@@ -64,10 +104,11 @@ def display_chat_messages(messages, displayed_ids):
                 st.markdown(message["message"])
 
 
-def load_chat_messages(refresh_token):
-    get_all_chat_response = get_all_chat(refresh_token)
+def load_chat_messages(session_id):
+    get_all_chat_response = get_all_chat(session_id)
     if get_all_chat_response and get_all_chat_response.status_code == 200:
-        return get_all_chat_response.json()
+        # Latest page only, older messages are fetched with its `before` cursor.
+        return get_all_chat_response.json()["messages"]
     st.error("Failed to retrieve chat messages!")
     return []  # Ensure a list is returned
 
@@ -84,28 +125,40 @@ def chat_page():
         st.session_state.messages = []
 
     if st.button("Start Chat"):
-        start_chat_response = start_chat(st.session_state.refresh_token)
+        start_chat_response = start_chat()
         if start_chat_response and start_chat_response.status_code == 200:
+            st.session_state.session_id = start_chat_response.json()["session_id"]
+            st.session_state.messages = []
             st.success("Chat started successfully!")
         else:
             st.error("Failed to start chat!")
 
-    if chat_messages := load_chat_messages(st.session_state.refresh_token):
+    if "session_id" not in st.session_state:
+        st.info("Start a chat to begin the conversation.")
+        return
+
+    if chat_messages := load_chat_messages(st.session_state.session_id):
         display_chat_messages(chat_messages, st.session_state.displayed_message_ids)
         st.session_state.messages = chat_messages
 
     if chat_message := st.chat_input("Type your message here..."):
         add_message_response = add_message_to_chat(
-            st.session_state.refresh_token, chat_message, stream=True
+            st.session_state.session_id,
+            chat_message,
+            stream=True,
         )
         if add_message_response and add_message_response.status_code == 200:
             st.session_state.messages.append({"role": "user", "message": chat_message})
             with st.chat_message("user"):
                 st.markdown(chat_message)
 
-            assistant_message = add_message_response.json().get("message", "")
+            final_message = {}
             with st.chat_message("assistant"):
-                st.markdown(assistant_message)
+                streamed = st.write_stream(
+                    stream_assistant_message(add_message_response, final_message)
+                )
+            # The persisted message has generated image links rewritten.
+            assistant_message = final_message.get("message", streamed)
             st.session_state.messages.append(
                 {"role": "assistant", "message": assistant_message}
             )
@@ -9,10 +9,24 @@ load_dotenv(find_dotenv())  # load environment variables from .env file
 class AuthConfig(BaseSettings):
     JWT_ALGORITHM: str = os.environ.get("JWT_ALG")
     SECRET_KEY: str = os.environ.get("JWT_SECRET")
-    JWT_EXPIRATION: int = 100  # minutes
+    JWT_EXPIRATION: int = 15  # minutes
+    JWT_KEY_ID: str = "v1"
+    # Retired signing secrets by key id, kept until their tokens have expired.
+    JWT_PREVIOUS_KEYS: dict[str, str] = {}
 
     REFRESH_TOKEN_KEY: str = "refreshToken"
     REFRESH_TOKEN_EXP: int = 60 * 60 * 24 * 21  # 21 days
+    REFRESH_TOKEN_CACHE_TTL: int = 60  # seconds
+    REFRESH_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+
+    # bcrypt runs on its own threads, requests beyond workers + queue get a 503.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+
+    # Per client address and route, sign-ins are cheap to brute force otherwise.
+    AUTH_RATE_LIMIT_CAPACITY: int = 10
+    AUTH_RATE_LIMIT_REFILL: float = 0.1  # requests per second
+    AUTH_RATE_LIMIT_MAX_LOCAL_BUCKETS: int = 10000
 
     SECURE_COOKIES: bool = True
 
@@ -5,4 +5,5 @@ class ErrorCode:
     INVALID_CREDENTIALS = "Invalid credentials."
     EMAIL_TAKEN = "Email is already taken."
     REFRESH_TOKEN_NOT_VALID = "Refresh token is not valid."
+    PASSWORD_HASHING_BUSY = "Too many sign-ins in progress, try again shortly."
     REFRESH_TOKEN_REQUIRED = "Refresh token is required either in the body or cookie."
@@ -2,38 +2,59 @@ import logging
 from datetime import datetime, timezone  # type: ignore
 
 from typing import Any  # type: ignore
-from fastapi import Depends, Body, Cookie
+from fastapi import Depends, Body, Cookie, Request
 from datetime import datetime, timezone  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.db import get_db
 from src.auth import service
-from src.auth.schemas import AuthUser
-from src.auth.exceptions import EmailTaken, RefreshTokenNotValid
+from src.rate_limit import RateLimiter, client_address
+from src.auth.config import auth_config
+from src.auth.schemas import AuthUser, RefreshTokenData
+from src.auth.exceptions import RefreshTokenNotValid
 
 logger = logging.getLogger(__name__)
 
+rate_limiter = RateLimiter(
+    "auth",
+    capacity=auth_config.AUTH_RATE_LIMIT_CAPACITY,
+    refill=auth_config.AUTH_RATE_LIMIT_REFILL,
+    max_local_buckets=auth_config.AUTH_RATE_LIMIT_MAX_LOCAL_BUCKETS,
+)
 
-async def valid_user_create(
-    user: AuthUser, db: AsyncSession = Depends(get_db)
-) -> AuthUser:
-    logger.info(user)
-    if await service.get_user_by_email(db, user.email):
-        raise EmailTaken()
 
-    return user
+async def rate_limit_address(request: Request) -> None:
+    await rate_limiter.check(request, client_address(request))
+
+
+async def rate_limit_login(request: Request, auth_data: AuthUser) -> AuthUser:
+    # Guessing one account's password is limited without locking out the
+    # other users behind the same address, e.g. the frontend server.
+    identity = f"{auth_data.email.lower()}:{client_address(request)}"
+    await rate_limiter.check(request, identity)
+    return auth_data
+
+
+async def rate_limit_refresh_token(
+    request: Request, refresh_token: str = Cookie(..., alias="refreshToken")
+) -> None:
+    # Keyed by the hash, the session it belongs to, not where it comes from.
+    await rate_limiter.check(request, service.hash_refresh_token(refresh_token))
 
 
 async def valid_refresh_token(
-    db: AsyncSession = Depends(get_db),
     refresh_token: str = Cookie(..., alias="refreshToken"),
-) -> dict[str, Any]:
-    db_refresh_token = await service.get_refresh_token(db, refresh_token)
+) -> RefreshTokenData:
+    db_refresh_token = await service.get_refresh_token(refresh_token)
 
     if not db_refresh_token:
         raise RefreshTokenNotValid()
 
     if not _is_valid_refresh_token(db_refresh_token):
+        # Drop it now rather than serving it from the cache until the TTL.
+        await service.refresh_token_cache.delete(
+            service.hash_refresh_token(refresh_token)
+        )
         raise RefreshTokenNotValid()
 
     return db_refresh_token
@@ -41,16 +62,16 @@ async def valid_refresh_token(
 
 async def valid_refresh_token_user(
     db: AsyncSession = Depends(get_db),
-    refresh_token: dict[str, Any] = Depends(valid_refresh_token),
+    refresh_token: RefreshTokenData = Depends(valid_refresh_token),
 ) -> dict[str, Any]:
-    user = await service.get_user_by_id(db, refresh_token["user_id"])
+    user = await service.get_user_by_id(db, refresh_token.user_id)
     if not user:
         raise RefreshTokenNotValid()
 
     return user
 
 
-def _is_valid_refresh_token(db_refresh_token: dict[str, Any]) -> bool:
+def _is_valid_refresh_token(db_refresh_token: RefreshTokenData) -> bool:
     expires_at = datetime.fromisoformat(str(db_refresh_token.expires_at)).astimezone(
         timezone.utc
     )
@@ -1,5 +1,10 @@
 from src.auth.constants import ErrorCode
-from src.exceptions import BadRequest, NotAuthenticated, PermissionDenied
+from src.exceptions import (
+    BadRequest,
+    NotAuthenticated,
+    PermissionDenied,
+    ServiceUnavailable,
+)
 
 
 class AuthRequired(NotAuthenticated):
@@ -24,3 +29,7 @@ class EmailTaken(BadRequest):
 
 class RefreshTokenNotValid(NotAuthenticated):
     DETAIL = ErrorCode.REFRESH_TOKEN_NOT_VALID
+
+
+class PasswordHashingBusy(ServiceUnavailable):
+    DETAIL = ErrorCode.PASSWORD_HASHING_BUSY
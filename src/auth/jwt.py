@@ -1,6 +1,6 @@
 from typing import Any  # type: ignore
 from jose import JWTError, jwt
-from datetime import timedelta  # type: ignore
+from datetime import datetime, timedelta, timezone  # type: ignore
 
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
@@ -14,42 +14,58 @@ from src.auth.exceptions import AuthorizationFailed, AuthRequired, InvalidToken
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/tokens", auto_error=False)
 
 
+def signing_keys() -> dict[str, str]:
+    """Secrets by key id, retired ones still verify until their tokens expire."""
+    return {
+        **auth_config.JWT_PREVIOUS_KEYS,
+        auth_config.JWT_KEY_ID: auth_config.SECRET_KEY,
+    }
+
+
 def create_access_token(
     *,
     user: User,
     expires_delta: timedelta = timedelta(minutes=auth_config.JWT_EXPIRATION),
 ) -> str:
-    # if user.is_admin:
-    #     jwt_data = {
-    #         "sub": str(user.id),
-    #         "exp": datetime.utcnow() + expires_delta,
-    #         "is_admin": user.is_admin,
-    #     }
-    # else:
+    now = datetime.now(timezone.utc)
     jwt_data = {
-        "email": str(user.email),
-        # "exp": datetime.utcnow() + expires_delta,
-        "password": str(user.password),
+        "sub": str(user.id),
+        "iat": now,
+        "exp": now + expires_delta,
+        "is_admin": bool(user.is_admin),
     }
 
     return jwt.encode(
-        jwt_data, auth_config.SECRET_KEY, algorithm=auth_config.JWT_ALGORITHM
+        jwt_data,
+        auth_config.SECRET_KEY,
+        algorithm=auth_config.JWT_ALGORITHM,
+        headers={"kid": auth_config.JWT_KEY_ID},
     )
 
 
+def decode_access_token(token: str) -> dict[str, Any]:
+    """Verify `token` in process, no database or cache involved."""
+    try:
+        key = signing_keys().get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise InvalidToken()
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[auth_config.JWT_ALGORITHM],
+            options={"require_sub": True, "require_iat": True, "require_exp": True},
+        )
+    except JWTError as e:
+        raise InvalidToken() from e
+
+
 async def parse_jwt_user_data_optional(
     token: str = Depends(oauth2_scheme),
 ) -> JWTData | None:
     if not token:
         return None
-    try:
-        payload = jwt.decode(
-            token, auth_config.SECRET_KEY, algorithms=[auth_config.JWT_ALGORITHM]
-        )
-    except JWTError as e:
-        raise InvalidToken() from e
 
-    return JWTData(**payload)
+    return JWTData(**decode_access_token(token))
 
 
 async def parse_jwt_user_data(
@@ -15,7 +15,9 @@ class User(Base, CreatedUpdatedMixin):
     id: Mapped[UUID] = mapped_column(
         sa.UUID, primary_key=True, server_default=func.uuid_generate_v4()
     )
-    email: Mapped[str] = mapped_column(sa.String, index=True, nullable=False)
+    email: Mapped[str] = mapped_column(
+        sa.String, index=True, unique=True, nullable=False
+    )
     password: Mapped[str]
     is_admin: Mapped[Optional[bool]] = mapped_column(
         sa.Boolean, server_default="false", nullable=False
@@ -35,7 +37,12 @@ class RefreshToken(Base, CreatedUpdatedMixin):
         sa.UUID, ForeignKey("auth_user.id", ondelete="CASCADE"), nullable=False
     )
     user: Mapped[User] = relationship("User")
-    refresh_token: Mapped[str] = mapped_column(sa.String, nullable=False)
+    # SHA-256 of the token, the token itself is only known to the client.
+    token_hash: Mapped[str] = mapped_column(
+        sa.String(64), unique=True, index=True, nullable=False
+    )
+    # Only set on tokens issued before `token_hash`.
+    refresh_token: Mapped[Optional[str]] = mapped_column(sa.String, nullable=True)
     expires_at: Mapped[datetime] = mapped_column(sa.DateTime, nullable=False)
 
     # def __repr__(self) -> str:
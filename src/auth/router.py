@@ -5,17 +5,24 @@ from typing import Any  # type: ignore
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi import APIRouter, Depends, Response, status
+from fastapi import APIRouter, Cookie, Depends, Response, status
 
 from src.auth import jwt, service, utils
 from src.auth.dependencies import (
+    rate_limit_address,
+    rate_limit_login,
+    rate_limit_refresh_token,
     valid_refresh_token,
     valid_refresh_token_user,
-    valid_user_create,
 )
 from src.db import get_db
-from src.auth.models import RefreshToken
-from src.auth.schemas import AccessTokenResponse, AuthUser, UserResponse
+from src.auth.models import User
+from src.auth.schemas import (
+    AccessTokenResponse,
+    AuthUser,
+    RefreshTokenData,
+    UserResponse,
+)
 
 router = APIRouter()
 
@@ -23,10 +30,15 @@ logger = logging.getLogger(__name__)
 
 
 # Create user
-@router.post("/users", status_code=status.HTTP_201_CREATED, response_model=UserResponse)
+@router.post(
+    "/users",
+    status_code=status.HTTP_201_CREATED,
+    response_model=UserResponse,
+    dependencies=[Depends(rate_limit_address)],
+)
 async def register_user(
+    auth_data: AuthUser,
     db: AsyncSession = Depends(get_db),
-    auth_data: AuthUser = Depends(valid_user_create),
 ) -> UserResponse:
     user = await service.create_user(db, auth_data)
     logger.info(f"User created: {user.email}")
@@ -66,8 +78,8 @@ async def register_user(
 
 @router.post("/users/tokens", response_model=AccessTokenResponse)
 async def auth_user(
-    auth_data: AuthUser,
     response: Response,
+    auth_data: AuthUser = Depends(rate_limit_login),
     db: AsyncSession = Depends(get_db),
 ) -> AccessTokenResponse:
     user = await service.authenticate_user(db, auth_data)
@@ -81,21 +93,48 @@ async def auth_user(
     )
 
 
-# @router.delete("/users/tokens")
-# async def logout_user(
-#     response: Response,
-#     refresh_token: dict[str, Any] = Depends(valid_refresh_token),
-# ) -> None:
-#     await service.expire_refresh_token(refresh_token["uuid"])
+# The refresh cookie is only used here to mint a new access token, rotating it.
+@router.put(
+    "/users/tokens",
+    response_model=AccessTokenResponse,
+    dependencies=[Depends(rate_limit_refresh_token)],
+)
+async def refresh_tokens(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    refresh_token: str = Cookie(..., alias="refreshToken"),
+    user: User = Depends(valid_refresh_token_user),
+) -> AccessTokenResponse:
+    refresh_token_value = await service.create_refresh_token(db, user_id=user.id)
+    await service.expire_refresh_token(db, refresh_token)
 
-#     response.delete_cookie(
-#         **utils.get_refresh_token_settings(refresh_token["refresh_token"], expired=True)
-#     )
+    response.set_cookie(**utils.get_refresh_token_settings(refresh_token_value))
+
+    return AccessTokenResponse(
+        access_token=jwt.create_access_token(user=user),
+        refresh_token=refresh_token_value,
+    )
+
+
+@router.delete(
+    "/users/tokens",
+    dependencies=[Depends(rate_limit_refresh_token), Depends(valid_refresh_token)],
+)
+async def logout_user(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    refresh_token: str = Cookie(..., alias="refreshToken"),
+) -> None:
+    await service.expire_refresh_token(db, refresh_token)
+
+    response.delete_cookie(
+        **utils.get_refresh_token_settings(refresh_token, expired=True)
+    )
 
 
-@router.post("/users/me")
+@router.post("/users/me", dependencies=[Depends(rate_limit_refresh_token)])
 async def get_user_info(
-    user: RefreshToken = Depends(valid_refresh_token),
+    user: RefreshTokenData = Depends(valid_refresh_token),
 ) -> dict[str, UUID]:
     logger.info(f"User requested: {user.user_id}")
     return {"user_id": user.user_id}
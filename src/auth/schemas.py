@@ -1,8 +1,10 @@
 import re  # type: ignore
 
+from uuid import UUID  # type: ignore
 from datetime import datetime  # type: ignore
 from typing_extensions import Annotated  # type: ignore
 from pydantic import EmailStr, Field, field_validator, BaseModel, AfterValidator
+from pydantic import ConfigDict
 
 
 STRONG_PASSWORD_PATTERN = re.compile(r"^(?=.*[\d])(?=.*[!@#$%^&*])[\w!@#$%^&*]{6,128}$")
@@ -28,7 +30,7 @@ class AuthUser(BaseModel):
 
 
 class JWTData(BaseModel):
-    user_id: int = Field(alias="sub")
+    user_id: UUID = Field(alias="sub")
     is_admin: bool = False
 
 
@@ -52,3 +54,13 @@ class UserCreate(BaseModel):
 class RefreshToken(BaseModel):
     refresh_token: str
     exp: datetime
+
+
+class RefreshTokenData(BaseModel):
+    """What a validated refresh token resolves to, as cached between requests."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    user_id: UUID
+    expires_at: datetime
@@ -1,11 +1,96 @@
-from passlib.context import CryptContext
+import asyncio
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from typing import Any, Callable  # type: ignore
+from concurrent.futures import Future, ThreadPoolExecutor  # type: ignore
 
+import bcrypt
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+from src.auth.config import auth_config
+from src.auth.exceptions import PasswordHashingBusy
 
+# bcrypt only uses the first 72 bytes, which passlib silently truncated to.
+BCRYPT_MAX_BYTES = 72
 
-def check_password(password: str, password_in_db: str) -> bool:
-    return pwd_context.verify(password, password_in_db)
+_executor: ThreadPoolExecutor | None = None
+
+
+class PasswordHashingStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def finish(self):
+        self.in_flight -= 1
+        self.completed += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "workers": auth_config.PASSWORD_HASH_WORKERS,
+            "queue_size": auth_config.PASSWORD_HASH_QUEUE_SIZE,
+        }
+
+
+stats = PasswordHashingStats()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    # bcrypt releases the GIL while it hashes, so threads are enough to keep
+    # the event loop and the streaming chats on it responsive.
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=auth_config.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash",
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def bcrypt_hash(password: str) -> str:
+    secret = password.encode()[:BCRYPT_MAX_BYTES]
+    return bcrypt.hashpw(secret, bcrypt.gensalt()).decode()
+
+
+def bcrypt_check(password: str, password_in_db: str) -> bool:
+    secret = password.encode()[:BCRYPT_MAX_BYTES]
+    return bcrypt.checkpw(secret, password_in_db.encode())
+
+
+async def _run_bounded(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run `fn` on the hashing pool, or reject right away when it is full."""
+    capacity = auth_config.PASSWORD_HASH_WORKERS + auth_config.PASSWORD_HASH_QUEUE_SIZE
+    if stats.in_flight >= capacity:
+        stats.rejected += 1
+        raise PasswordHashingBusy()
+
+    loop = asyncio.get_running_loop()
+
+    def done(_future: Future):
+        # Counted until the worker is free, even if the request went away.
+        try:
+            loop.call_soon_threadsafe(stats.finish)
+        except RuntimeError:
+            pass  # loop already closed
+
+    stats.in_flight += 1
+    future = get_executor().submit(fn, *args)
+    future.add_done_callback(done)
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password(password: str) -> str:
+    return await _run_bounded(bcrypt_hash, password)
+
+
+async def check_password(password: str, password_in_db: str) -> bool:
+    return await _run_bounded(bcrypt_check, password, password_in_db)
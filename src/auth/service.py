@@ -1,30 +1,51 @@
-import uuid  # type: ignore
+import hashlib
 import logging
 
 from typing import Any  # type: ignore
 from datetime import datetime, timedelta  # type: ignore
 
-from pydantic import UUID4
 from sqlalchemy import select, update, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
+from src.db import Session
 from src.auth import utils
+from src.cache import Cache
 from src.auth.config import auth_config
-from src.auth.exceptions import InvalidCredentials
-from src.auth.schemas import AuthUser
+from src.auth.exceptions import EmailTaken, InvalidCredentials
+from src.auth.schemas import AuthUser, RefreshTokenData
 from src.auth.security import check_password, hash_password
 from src.auth.models import User, RefreshToken
 
 logger = logging.getLogger(__name__)
 
+# Validated tokens by hash, so most requests authenticate without a query.
+refresh_token_cache = Cache(
+    "refresh_token",
+    ttl=auth_config.REFRESH_TOKEN_CACHE_TTL,
+    max_entries=auth_config.REFRESH_TOKEN_CACHE_MAX_ENTRIES,
+    dumps=lambda token: token.model_dump_json(),
+    loads=RefreshTokenData.model_validate_json,
+)
+
 
 async def create_user(db: AsyncSession, user_data: AuthUser) -> User:
-    hashed_password = hash_password(user_data.password)
-    created_user = User(
-        id=str(uuid.uuid4()), email=user_data.email, password=hashed_password
+    """Insert the user in a single statement, `EmailTaken` if the email exists.
+
+    The unique constraint on `auth_user.email` settles concurrent signups, the
+    losing inserts return no row.
+    """
+    hashed_password = await hash_password(user_data.password)
+    insert_query = (
+        pg_insert(User)
+        .values(email=user_data.email, password=hashed_password)
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
     )
-    db.add(created_user)
+    created_user = (await db.execute(insert_query)).scalar_one_or_none()
+    if created_user is None:
+        raise EmailTaken()
+
     await db.commit()
     return created_user
 
@@ -41,6 +62,10 @@ async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     return result.scalar_one_or_none()
 
 
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
 async def create_refresh_token(
     db: AsyncSession, *, user_id: int, refresh_token: str | None = None
 ) -> str:
@@ -48,7 +73,7 @@ async def create_refresh_token(
         refresh_token = utils.generate_random_alphanum(64)
 
     insert_query = RefreshToken(
-        refresh_token=refresh_token,
+        token_hash=hash_refresh_token(refresh_token),
         expires_at=utils.calculate_refresh_token_expiry(),
         user_id=user_id,
     )
@@ -58,23 +83,38 @@ async def create_refresh_token(
     return refresh_token
 
 
-async def get_refresh_token(db: AsyncSession, refresh_token: str) -> RefreshToken:
-    select_query = (
-        select(RefreshToken)
-        .where(RefreshToken.refresh_token == refresh_token)
-        .options(selectinload(RefreshToken.user))
-    )
-    result = await db.execute(select_query)
-    return result.scalar_one_or_none()
+async def get_refresh_token(refresh_token: str) -> RefreshTokenData | None:
+    """Resolve `refresh_token`, from `refresh_token_cache` when possible.
+
+    Only the hash of the token is looked up and used as the cache key.
+    Expiry is not checked here, see `dependencies.valid_refresh_token`.
+    """
+    token_hash = hash_refresh_token(refresh_token)
+
+    async def load() -> RefreshTokenData | None:
+        # Its own session, concurrent misses share this lookup and outlive
+        # the request that started it if that one goes away.
+        async with Session() as db:
+            select_query = select(
+                RefreshToken.id, RefreshToken.user_id, RefreshToken.expires_at
+            ).where(RefreshToken.token_hash == token_hash)
+            result = await db.execute(select_query)
+            row = result.one_or_none()
+        return RefreshTokenData.model_validate(row) if row else None
 
+    return await refresh_token_cache.get_or_set(token_hash, load)
 
-async def expire_refresh_token(db: AsyncSession, refresh_token_uuid: UUID4) -> None:
+
+async def expire_refresh_token(db: AsyncSession, refresh_token: str) -> None:
+    token_hash = hash_refresh_token(refresh_token)
     update_query = (
         update(RefreshToken)
-        .where(RefreshToken.id == refresh_token_uuid)
-        .values(expires_at=datetime.now())
+        .where(RefreshToken.token_hash == token_hash)
+        .values(expires_at=datetime.utcnow())
     )
     await db.execute(update_query)
+    await db.commit()
+    await refresh_token_cache.delete(token_hash)
 
 
 async def authenticate_user(db: AsyncSession, auth_data: AuthUser) -> User:
@@ -82,7 +122,7 @@ async def authenticate_user(db: AsyncSession, auth_data: AuthUser) -> User:
     if not user:
         raise InvalidCredentials()
 
-    if not check_password(auth_data.password, user.password):
+    if not await check_password(auth_data.password, user.password):
         raise InvalidCredentials()
 
     return user
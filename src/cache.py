@@ -0,0 +1,196 @@
+import json
+import zlib
+import time
+import base64
+import asyncio
+import logging
+
+from collections import OrderedDict  # type: ignore
+from typing import Any, Awaitable, Callable  # type: ignore
+
+from redis.exceptions import RedisError
+
+from src import redis
+
+logger = logging.getLogger(__name__)
+
+# Every `Cache` registers itself here so its counters can be exposed.
+caches: dict[str, "Cache"] = {}
+
+
+def compress(text: str) -> str:
+    return base64.b64encode(zlib.compress(text.encode())).decode()
+
+
+def decompress(data: str) -> str:
+    return zlib.decompress(base64.b64decode(data)).decode()
+
+
+class LRUCache:
+    """In-process LRU mapping with per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        if (entry := self._entries.get(key)) is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Cache:
+    """TTL and size bounded cache, in Redis when available.
+
+    Entries live under `cache:<namespace>:` in Redis, with a sorted set of
+    last access times used to evict the least recently used keys beyond
+    `max_entries`. Without a Redis client, or when a Redis call fails, the
+    in-process `LRUCache` is used instead so callers keep working.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: int,
+        max_entries: int,
+        dumps: Callable[[Any], str] = json.dumps,
+        loads: Callable[[str], Any] = json.loads,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.dumps = dumps
+        self.loads = loads
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+
+        self._inflight: dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.errors = 0
+        self.miss_seconds = 0.0
+
+        caches[namespace] = self
+
+    def _key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    @property
+    def _index(self) -> str:
+        return f"cache:{self.namespace}:lru"
+
+    async def _redis_get(self, client, key: str) -> Any | None:
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.get(self._key(key))
+            pipe.zadd(self._index, {key: time.time()}, xx=True)
+            value, _ = await pipe.execute()
+        return None if value is None else self.loads(value)
+
+    async def _redis_set(self, client, key: str, value: Any):
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(key), self.dumps(value), ex=self.ttl)
+            pipe.zadd(self._index, {key: time.time()})
+            pipe.zcard(self._index)
+            *_, size = await pipe.execute()
+
+        if size > self.max_entries:
+            evicted = await client.zpopmin(self._index, size - self.max_entries)
+            if evicted:
+                await client.delete(*[self._key(member) for member, _ in evicted])
+
+    async def get(self, key: str) -> Any | None:
+        if (client := redis.redis_client) is not None:
+            try:
+                return await self._redis_get(client, key)
+            except RedisError as e:
+                self.errors += 1
+                logger.warning(f"Error reading {self.namespace} cache: {e}")
+        return self.local.get(key)
+
+    async def set(self, key: str, value: Any):
+        if (client := redis.redis_client) is not None:
+            try:
+                await self._redis_set(client, key, value)
+                return
+            except RedisError as e:
+                self.errors += 1
+                logger.warning(f"Error writing {self.namespace} cache: {e}")
+        self.local.set(key, value)
+
+    async def delete(self, key: str):
+        self.local.delete(key)
+        if (client := redis.redis_client) is not None:
+            try:
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.delete(self._key(key))
+                    pipe.zrem(self._index, key)
+                    await pipe.execute()
+            except RedisError as e:
+                self.errors += 1
+                logger.warning(f"Error deleting from {self.namespace} cache: {e}")
+
+    async def get_or_set(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, computing and storing it on a miss.
+
+        Concurrent misses for the same key share a single `factory` call.
+        """
+        if (value := await self.get(key)) is not None:
+            self.hits += 1
+            return value
+
+        if (task := self._inflight.get(key)) is not None:
+            self.collapsed += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._fill(key, factory))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shielded so a cancelled caller does not cancel the call others await.
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        value = await factory()
+        self.miss_seconds += time.perf_counter() - start
+
+        if value is not None:
+            await self.set(key, value)
+        return value
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses + self.collapsed
+        avg_miss_seconds = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "collapsed": self.collapsed,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_miss_seconds": round(avg_miss_seconds, 4),
+            # what the hits would have cost at the average miss latency
+            "saved_seconds": round((self.hits + self.collapsed) * avg_miss_seconds, 2),
+            "local_entries": len(self.local),
+        }
@@ -0,0 +1,159 @@
+import json
+import uuid  # type: ignore
+import logging
+
+from datetime import datetime  # type: ignore
+
+from redis.exceptions import RedisError, WatchError
+
+from src import redis
+from src.chat.config import chat_config
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationCache:
+    """Write-through cache holding the serialized tail of a chat session.
+
+    Each session is a Redis list of `{"role", "message", "created_at"}`
+    JSON entries, trimmed to `max_messages` and expired after `ttl` seconds of
+    inactivity. Every append bumps a version counter next to the list, and a
+    fill only lands if the version it read before querying Postgres is still
+    current, so a stale snapshot never overwrites a newer tail.
+    Redis failures are logged and treated as a miss so Postgres stays the
+    source of truth.
+    """
+
+    def __init__(
+        self,
+        ttl: int = chat_config.HISTORY_CACHE_TTL,
+        max_messages: int = chat_config.HISTORY_CACHE_MAX_MESSAGES,
+    ):
+        self.ttl = ttl
+        self.max_messages = max_messages
+
+    @staticmethod
+    def _key(session_id: uuid.UUID) -> str:
+        return f"chat:history:{session_id}"
+
+    @staticmethod
+    def _version_key(session_id: uuid.UUID) -> str:
+        return f"chat:history:{session_id}:version"
+
+    @staticmethod
+    def _dump(role: str, content: str, created_at: datetime | None) -> str:
+        return json.dumps(
+            {
+                "role": role,
+                "message": content,
+                "created_at": created_at.isoformat() if created_at else None,
+            }
+        )
+
+    @staticmethod
+    def _load(entry: str) -> tuple[str, str, datetime | None]:
+        data = json.loads(entry)
+        created_at = data.get("created_at")
+        return (
+            data["role"],
+            data["message"],
+            datetime.fromisoformat(created_at) if created_at else None,
+        )
+
+    async def load(
+        self, session_id: uuid.UUID
+    ) -> list[tuple[str, str, datetime | None]] | None:
+        client = redis.redis_client
+        if client is None:
+            return None
+
+        key = self._key(session_id)
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.lrange(key, 0, -1)
+                pipe.expire(key, self.ttl)
+                pipe.expire(self._version_key(session_id), self.ttl)
+                entries, _, _ = await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Error loading cached history: {e}")
+            return None
+
+        if not entries:
+            return None
+        return [self._load(entry) for entry in entries]
+
+    async def version(self, session_id: uuid.UUID) -> str | None:
+        """Version to hand to `fill`, read before loading the history."""
+        client = redis.redis_client
+        if client is None:
+            return None
+
+        try:
+            return await client.get(self._version_key(session_id))
+        except RedisError as e:
+            logger.warning(f"Error reading history cache version: {e}")
+            return None
+
+    async def fill(
+        self,
+        session_id: uuid.UUID,
+        messages: list[tuple[str, str, datetime | None]],
+        version: str | None,
+    ):
+        """Cache `messages` unless the session was appended to since `version`.
+
+        A newer message may have been committed, and appended, after the
+        history was read from Postgres; filling then would wipe it from the
+        cached tail, so the fill is dropped and the next load reads again.
+        """
+        client = redis.redis_client
+        if client is None or not messages:
+            return
+
+        key = self._key(session_id)
+        version_key = self._version_key(session_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                await pipe.watch(version_key)
+                if await pipe.get(version_key) != version:
+                    return
+                pipe.multi()
+                pipe.delete(key)
+                pipe.rpush(key, *[self._dump(*message) for message in messages])
+                pipe.ltrim(key, -self.max_messages, -1)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except WatchError:
+            pass  # appended to while filling, same as a version mismatch
+        except RedisError as e:
+            logger.warning(f"Error filling history cache: {e}")
+
+    async def append(
+        self,
+        session_id: uuid.UUID,
+        role: str,
+        content: str,
+        created_at: datetime | None = None,
+    ):
+        client = redis.redis_client
+        if client is None:
+            return
+
+        # RPUSHX only appends to a warm key; a cold conversation is filled from
+        # Postgres on the next load so the cached tail never has gaps. The
+        # version is bumped either way so fills racing this append are dropped.
+        key = self._key(session_id)
+        version_key = self._version_key(session_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.rpushx(key, self._dump(role, content, created_at))
+                pipe.ltrim(key, -self.max_messages, -1)
+                pipe.expire(key, self.ttl)
+                pipe.incr(version_key)
+                pipe.expire(version_key, self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Error appending to history cache: {e}")
+
+
+history_cache = ConversationCache()
@@ -1,18 +1,44 @@
 import uuid  # type: ignore
 import json
+import asyncio
 import logging
 
 from fastapi import Request
-from typing import Any, Optional, List, Union  # type: ignore
-from langchain_openai.chat_models import ChatOpenAI
+from contextlib import aclosing  # type: ignore
+from datetime import datetime  # type: ignore
+from typing import Any, AsyncGenerator, Optional, List, Union  # type: ignore
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 
-from sqlalchemy import select
+from sqlalchemy import asc, desc, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.config import settings
+from src.db import Session
+from src.clients import get_clients
+from src.chat.cache import history_cache
+from src.chat.config import chat_config
+from src.chat.compaction import compact, tool_token_budget
+from src.chat.context import (
+    HistoryEntry,
+    build_context_window,
+    count_message_tokens,
+    get_summary,
+    load_tool_exchanges,
+    schedule_summary_update,
+    store_tool_calls,
+    to_langchain_messages,
+)
+from src.chat.greetings import get_greeting
 from src.chat.helpers import exa_search, get_generated_image
-from src.chat.services import map_all_urls, contains_any_url, update_chat_image_chat_id
+from src.chat.prompts import get_system_prompt
+from src.chat.schemas import ChatMessageOut, ChatMessagePage
+from src.chat.services import (
+    contains_any_url,
+    create_chat_session,
+    encode_cursor,
+    link_chat_images,
+    map_all_urls,
+)
+from src.chat.thumbnails import enqueue_thumbnail
 from src.chat.models import ChatMessage, ChatRole
 
 logger = logging.getLogger(__name__)
@@ -20,60 +46,105 @@ GPT4 = "gpt-4o"
 GPT3 = "gpt-3.5-turbo-0125"
 
 
+TOOLS = {tool.name: tool for tool in (exa_search, get_generated_image)}
+
+
+def latest_question(messages: list) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage) and isinstance(message.content, str):
+            return message.content
+    return ""
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def history_stmt(session_id: uuid.UUID, limit: Optional[int] = None):
+    """The prompt-relevant columns of the newest `limit` messages of a session."""
+    return (
+        select(ChatMessage.role, ChatMessage.message, ChatMessage.created_at)
+        .where(
+            (ChatMessage.session_id == session_id)
+            & (ChatMessage.role.in_([ChatRole.ASSISTANT, ChatRole.USER]))
+        )
+        .order_by(ChatMessage.created_at.desc())
+        .limit(limit)
+    )
+
+
+async def load_history_entries(
+    db: AsyncSession, session_id: uuid.UUID, limit: Optional[int] = None
+) -> list[HistoryEntry]:
+    """Session history as `(role, message, created_at)` tuples, oldest first.
+
+    Runs on the session's connection rather than through the ORM, so rows
+    come back as plain tuples without instances, identity map or relationship
+    loading. Selected newest-first so `limit` keeps the tail.
+    """
+    connection = await db.connection()
+    result = await connection.execute(history_stmt(session_id, limit))
+    entries = [
+        (role.value, message, created_at) for role, message, created_at in result
+    ]
+    entries.reverse()
+    return entries
+
+
 class Chat:
-    def __init__(self, db: AsyncSession, user_id: uuid.UUID):
+    def __init__(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        session_id: Optional[uuid.UUID] = None,
+        system_prompt_version: Optional[str] = None,
+    ):
         self.db = db
         self.user_id = user_id
+        # Set by `initialize_task_chat` when a new session is started.
+        self.session_id = session_id
+        self.system_prompt_version = system_prompt_version
         self.messages: list[ChatMessage] = []
-        self.tools = [exa_search, get_generated_image]
-        self.chat_model = ChatOpenAI(
-            openai_api_key=settings.OPENAI_API_KEY, model=GPT4
-        ).bind_tools(self.tools)
+        self.tools = list(TOOLS.values())
+        self.chat_model = get_clients().chat_model(GPT4, tools=self.tools)
+        # Used for the last step of the tool loop so the model has to answer.
+        self.answer_model = get_clients().chat_model(
+            GPT4, tools=self.tools, tool_choice="none"
+        )
 
     async def get_messages(self, db: AsyncSession):
         stmt = (
             select(ChatMessage)
-            .where(ChatMessage.user_id == self.user_id)
+            .where(ChatMessage.session_id == self.session_id)
             .order_by(ChatMessage.created_at.asc())
         )
         result = await db.execute(stmt)
         return result.scalars().all()
 
     async def initialize_task_chat(
-        self, db: AsyncSession, stream: bool = False
+        self, db: AsyncSession, request: Optional[Request] = None, stream: bool = False
     ) -> dict:
         try:
-            system_prompt = (
-                "You are Sales chatbot AI conversational assistant."
-                "You are an expert in business strategy. "
-                "Done share any text from previous messages with the user."
-                "Greet the user and ask them how you can help them."
-                "Keep the conversation short and concise along with making it interesting."
-            )
+            # The session records the prompt version, history only holds turns.
+            chat_session = await create_chat_session(db, self.user_id)
+            self.session_id = chat_session.id
+            self.system_prompt_version = chat_session.system_prompt_version
 
-            # This is for system prompt
-            message = await self.add_system_message(
-                db=db,
-                content=system_prompt,
-                commit=True,
-                user_id=self.user_id,
-            )
+            greeting = await get_greeting(self.system_prompt)
+            if greeting is not None:
+                message = await self.add_assistant_message(
+                    db=db, content=greeting, commit=True, user_id=self.user_id
+                )
+                return self.stream_greeting(message) if stream else message
 
-            message_history = await self.get_message_history()
+            message_history = await self.get_context_window()
 
             logger.debug(f"message_history: {message_history}")
 
             if stream:
-
-                def response():
-                    content = ""
-                    for chunk in self.chat_model.astream(message_history):
-                        content += chunk
-                        yield chunk
-                    message.content = content
-                    db.add(message)
-
-                return response()
+                # The completion is saved in a session of its own.
+                await db.commit()
+                return self.stream_completion(request, message_history)
             else:
                 completion = await self.chat_model.ainvoke(message_history)
 
@@ -100,14 +171,20 @@ class Chat:
     ):
         try:
             logger.info("I am here in add_message !!!")
-            message = ChatMessage(user_id=user_id, role=role, message=content)
+            message = ChatMessage(
+                user_id=user_id, session_id=self.session_id, role=role, message=content
+            )
 
             db.add(message)
 
             if commit:
                 await db.commit()
                 await db.refresh(message)
+                await history_cache.append(
+                    self.session_id, role, content, message.created_at
+                )
             else:
+                # Cached by the caller once its transaction has committed.
                 await db.flush()
 
             self.messages.append(message)
@@ -150,34 +227,54 @@ class Chat:
             db=db, role="assistant", content=content, commit=commit, user_id=user_id
         )
 
-    async def get_all_messages_roles(self, user_id: uuid.UUID):
-        stmt = (
-            select(ChatMessage)
-            .where(
-                (ChatMessage.user_id == user_id)
-                & (
-                    ChatMessage.role.in_(
-                        [ChatRole.ASSISTANT, ChatRole.USER, ChatRole.SYSTEM]
-                    )
-                )
-            )
-            .order_by(ChatMessage.created_at.asc())
+    async def get_history_entries(self) -> list[HistoryEntry]:
+        cached = await history_cache.load(self.session_id)
+        if cached is not None:
+            return cached
+
+        version = await history_cache.version(self.session_id)
+        entries = await load_history_entries(
+            self.db, self.session_id, limit=history_cache.max_messages
         )
-        result = await self.db.execute(stmt)
-        messages = result.scalars().all()
+        await history_cache.fill(self.session_id, entries, version)
+        return entries
 
-        return list(messages) if messages else None
+    @property
+    def system_prompt(self) -> str:
+        return get_system_prompt(self.system_prompt_version)
 
     async def get_message_history(self):
-        message_history: list[HumanMessage | AIMessage | SystemMessage] = []
-        messages = await self.get_all_messages_roles(user_id=self.user_id)
-        for message in messages:
-            if message.role == "user":
-                message_history.append(HumanMessage(content=message.message))
-            elif message.role == "assistant":
-                message_history.append(AIMessage(content=message.message))
-            elif message.role == "system":
-                message_history.append(SystemMessage(content=message.message))
+        # Prompts stored by older versions are replaced by the session's.
+        history = [
+            message
+            for message in to_langchain_messages(await self.get_history_entries())
+            if not isinstance(message, SystemMessage)
+        ]
+        return [SystemMessage(content=self.system_prompt)] + history
+
+    async def get_context_window(self, reserve_tokens: int = 0):
+        """History trimmed to the token budget, with older turns summarized.
+
+        `reserve_tokens` is held back for content the caller appends itself.
+        """
+        entries = await self.get_history_entries()
+        summary = await get_summary(self.db, self.session_id)
+        tool_exchanges = await load_tool_exchanges(
+            self.db, self.session_id, since=entries[0][2] if entries else None
+        )
+
+        message_history, cutoff = build_context_window(
+            entries,
+            system_prompt=self.system_prompt,
+            summary=summary,
+            budget=chat_config.CONTEXT_TOKEN_BUDGET - reserve_tokens,
+            tool_exchanges=tool_exchanges,
+            # Older turns were left out of the load, summarized or not.
+            truncated=len(entries) >= history_cache.max_messages,
+        )
+        if cutoff is not None:
+            schedule_summary_update(self.session_id, cutoff)
+
         return message_history
 
     async def task_chat(
@@ -193,19 +290,10 @@ class Chat:
                 db=db, content=user_message, user_id=self.user_id
             )
 
-            message_history = await self.get_message_history()
+            message_history = await self.get_context_window()
 
             if stream:
-
-                async def response():
-                    content = ""
-                    async for chunk in self.chat_model.astream(message_history):
-                        content += chunk
-                        yield chunk
-                    message.content = content
-                    db.add(message)
-
-                return response()
+                return self.stream_completion(request, message_history)
 
             message = await self.process_completion(
                 request, db, message_history, self.user_id
@@ -227,8 +315,9 @@ class Chat:
         user_id: uuid.UUID,
     ):
         try:
-            while True:
-                completion = await self.chat_model.ainvoke(message_history)
+            tool_steps = []
+            for step in range(chat_config.MAX_TOOL_ITERATIONS + 1):
+                completion = await self.model_for_step(step).ainvoke(message_history)
                 logger.debug(f"completion: {completion}")
 
                 tool_calls = completion.tool_calls
@@ -236,57 +325,281 @@ class Chat:
                     break
 
                 message_history.append(completion)
-                for tool_call in tool_calls:
-                    if selected_tool := {
-                        "exa_search": exa_search,
-                        "get_generated_image": get_generated_image,
-                    }.get(tool_call["name"].lower()):
-                        tool_output = await selected_tool.ainvoke(tool_call["args"])
-                        message_history.append(
-                            ToolMessage(tool_output, tool_call_id=tool_call["id"])
-                        )
-
-            chat_image_ids = []
-            if contains_any_url(
-                completion.content, "https://oaidalleapiprodscus.blob.core.windows.net"
-            ):
-                result = await map_all_urls(request, db, completion.content)
-                url_mapping = result["url_mapping"]
-                chat_image_ids = result["chat_image_ids"]
-
-                for original_url, local_url in url_mapping.items():
-                    completion.content = completion.content.replace(
-                        original_url, local_url
-                    )
+                tool_messages = await self.run_tool_calls(tool_calls, message_history)
+                tool_steps.append((completion, tool_messages))
 
-            message = await self.add_assistant_message(
-                db=db, content=completion.content, commit=True, user_id=user_id
+            return await self.save_completion(
+                request, db, completion.content, user_id, tool_steps=tool_steps
             )
-            logger.debug(f"Message: {message}")
-
-            if chat_image_ids:
-                for chat_image_id in chat_image_ids:
-                    await update_chat_image_chat_id(db, chat_image_id, message.id)
-
-            return message
 
         except Exception as e:
             logger.error(f"Error processing completion: {e}")
             raise
 
-    async def get_all_messages(self):
-        stmt = (
-            select(ChatMessage)
-            .where(
-                (ChatMessage.user_id == self.user_id)
-                & (ChatMessage.role.in_([ChatRole.ASSISTANT, ChatRole.USER]))
+    async def stream_completion(
+        self,
+        request: Request,
+        message_history: List[Union[HumanMessage, AIMessage, SystemMessage]],
+    ) -> AsyncGenerator[str, None]:
+        """Stream the completion to the client as Server-Sent Events.
+
+        Emits `token` events as content arrives, a `tool` event before each
+        round of tool calls and a final `done` event carrying the persisted
+        message. Generation stops as soon as the client disconnects, in which
+        case nothing is persisted. The request session is gone by the time the
+        body is streamed, so the assistant message is saved in its own session.
+        """
+        try:
+            tool_steps = []
+            for step in range(chat_config.MAX_TOOL_ITERATIONS + 1):
+                completion = None
+                chat_model = self.model_for_step(step)
+                async with aclosing(chat_model.astream(message_history)) as chunks:
+                    async for chunk in chunks:
+                        if await request.is_disconnected():
+                            logger.info("Client disconnected, stopping generation")
+                            return
+
+                        completion = chunk if completion is None else completion + chunk
+                        if chunk.content:
+                            yield sse_event("token", {"content": chunk.content})
+
+                if completion is None or not completion.tool_calls:
+                    break
+
+                message_history.append(completion)
+                yield sse_event(
+                    "tool",
+                    {
+                        "names": [
+                            tool_call["name"] for tool_call in completion.tool_calls
+                        ]
+                    },
+                )
+                tool_messages = await self.run_tool_calls(
+                    completion.tool_calls, message_history
+                )
+                tool_steps.append((completion, tool_messages))
+
+            async with Session() as db:
+                message = await self.save_completion(
+                    request,
+                    db,
+                    completion.content if completion else "",
+                    self.user_id,
+                    tool_steps=tool_steps,
+                )
+            yield sse_event(
+                "done",
+                {
+                    "id": str(message.id),
+                    "session_id": str(message.session_id),
+                    "content": message.message,
+                },
             )
-            .order_by(ChatMessage.created_at.asc())
+
+        except Exception as e:
+            logger.error(f"Error streaming completion: {e}")
+            yield sse_event(
+                "error", {"detail": "An error occurred while generating the response."}
+            )
+
+    async def stream_greeting(self, message: ChatMessage) -> AsyncGenerator[str, None]:
+        """The already persisted greeting `message` as `stream_completion` events."""
+        yield sse_event("token", {"content": message.message})
+        yield sse_event(
+            "done",
+            {
+                "id": str(message.id),
+                "session_id": str(message.session_id),
+                "content": message.message,
+            },
+        )
+
+    def model_for_step(self, step: int):
+        if step < chat_config.MAX_TOOL_ITERATIONS:
+            return self.chat_model
+
+        logger.warning(
+            f"Reached {chat_config.MAX_TOOL_ITERATIONS} tool steps, forcing an answer"
         )
-        result = await self.db.execute(stmt)
-        messages = result.scalars().all()
-        logger.debug(f"messages: {messages}")
-        return list(messages) if messages else None
+        return self.answer_model
+
+    async def run_tool_calls(
+        self,
+        tool_calls: list[dict],
+        message_history: List[Union[HumanMessage, AIMessage, SystemMessage]],
+    ) -> list[ToolMessage]:
+        """Run the tool calls of one step concurrently.
+
+        At most `TOOL_MAX_CONCURRENCY` tools run at once and each gets
+        `TOOL_TIMEOUT` seconds. Every call is answered with a `ToolMessage`, in
+        the order the model issued them, even when the tool is unknown, fails
+        or times out, since the API rejects a history with unanswered calls.
+        Outputs are compacted to the sentences most relevant to the user's
+        question and the call's arguments, within the tool's token budget.
+        The answers are appended to `message_history` and returned.
+        """
+        semaphore = asyncio.Semaphore(chat_config.TOOL_MAX_CONCURRENCY)
+        question = latest_question(message_history)
+
+        async def run(tool_call: dict) -> ToolMessage:
+            name = tool_call["name"]
+            if (selected_tool := TOOLS.get(name.lower())) is None:
+                logger.warning(f"Model requested unknown tool: {name}")
+                return ToolMessage(
+                    f"Unknown tool: {name}", tool_call_id=tool_call["id"]
+                )
+
+            async with semaphore:
+                try:
+                    tool_output = await asyncio.wait_for(
+                        selected_tool.ainvoke(tool_call["args"]),
+                        timeout=chat_config.TOOL_TIMEOUT,
+                    )
+                except asyncio.TimeoutError:
+                    logger.error(f"Tool {name} timed out")
+                    tool_output = f"Tool {name} timed out."
+                except Exception as e:
+                    logger.error(f"Error running tool {name}: {e}")
+                    tool_output = f"Tool {name} failed."
+
+            # Ranking tokenizes the whole output, keep it off the event loop.
+            query = " ".join([question, *map(str, tool_call["args"].values())])
+            tool_output = await asyncio.to_thread(
+                compact, str(tool_output), query, tool_token_budget(name)
+            )
+            return ToolMessage(tool_output, tool_call_id=tool_call["id"])
+
+        tool_messages = await asyncio.gather(
+            *(run(tool_call) for tool_call in tool_calls)
+        )
+        message_history.extend(tool_messages)
+        return tool_messages
+
+    async def save_completion(
+        self,
+        request: Request,
+        db: AsyncSession,
+        content: str,
+        user_id: uuid.UUID,
+        tool_steps: Optional[list[tuple[AIMessage, list[ToolMessage]]]] = None,
+    ):
+        chat_image_ids, pending_thumbnails = [], []
+        if contains_any_url(
+            content, "https://oaidalleapiprodscus.blob.core.windows.net"
+        ):
+            result = await map_all_urls(request, db, content)
+            url_mapping = result["url_mapping"]
+            chat_image_ids = result["chat_image_ids"]
+            pending_thumbnails = result["pending_thumbnails"]
+
+            for original_url, local_url in url_mapping.items():
+                content = content.replace(original_url, local_url)
+
+        # The message, its tool calls and its images are committed together.
+        message = await self.add_assistant_message(
+            db=db, content=content, commit=False, user_id=user_id
+        )
+        logger.debug(f"Message: {message}")
+
+        if tool_steps:
+            store_tool_calls(db, message, tool_steps)
+
+        if chat_image_ids:
+            await link_chat_images(db, chat_image_ids, message.id)
+
+        await db.commit()
+        await db.refresh(message)
+        await history_cache.append(
+            self.session_id, "assistant", content, message.created_at
+        )
+
+        for sha256 in pending_thumbnails:
+            enqueue_thumbnail(sha256)
+
+        return message
+
+    def all_messages_stmt(
+        self,
+        before: Optional[tuple[datetime, uuid.UUID]] = None,
+        after: Optional[tuple[datetime, uuid.UUID]] = None,
+    ):
+        """User and assistant messages of the session between keyset cursors."""
+        stmt = select(
+            ChatMessage.id,
+            ChatMessage.role,
+            ChatMessage.message,
+            ChatMessage.created_at,
+        ).where(
+            (ChatMessage.session_id == self.session_id)
+            & (ChatMessage.role.in_([ChatRole.ASSISTANT, ChatRole.USER]))
+        )
+
+        key = tuple_(ChatMessage.created_at, ChatMessage.id)
+        if before is not None:
+            stmt = stmt.where(key < tuple_(*before))
+        if after is not None:
+            stmt = stmt.where(key > tuple_(*after))
+        return stmt
+
+    async def get_all_messages(
+        self,
+        before: Optional[tuple[datetime, uuid.UUID]] = None,
+        after: Optional[tuple[datetime, uuid.UUID]] = None,
+        limit: int = chat_config.HISTORY_PAGE_SIZE,
+    ) -> ChatMessagePage:
+        """One page of the session, oldest first.
+
+        Without `after` this is the newest `limit` messages (before `before`
+        if given); with `after` it is the oldest `limit` messages after it.
+        """
+        stmt = self.all_messages_stmt(before=before, after=after)
+
+        newest_first = after is None
+        order = desc if newest_first else asc
+        stmt = stmt.order_by(order(ChatMessage.created_at), order(ChatMessage.id))
+
+        # One extra row tells whether another page follows.
+        rows = (await self.db.execute(stmt.limit(limit + 1))).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if newest_first:
+            rows.reverse()
+
+        has_older = has_more if newest_first else bool(rows)
+        return ChatMessagePage(
+            messages=[ChatMessageOut.model_validate(row) for row in rows],
+            before=encode_cursor(rows[0].created_at, rows[0].id) if has_older else None,
+            after=(
+                encode_cursor(rows[-1].created_at, rows[-1].id)
+                if rows
+                else encode_cursor(*after) if after else None
+            ),
+        )
+
+    async def stream_all_messages(
+        self,
+        before: Optional[tuple[datetime, uuid.UUID]] = None,
+        after: Optional[tuple[datetime, uuid.UUID]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Every message between the cursors as NDJSON, oldest first.
+
+        Rows are fetched `HISTORY_STREAM_BATCH` at a time from a server-side
+        cursor, in a session of its own since the body outlives the request's.
+        """
+        stmt = self.all_messages_stmt(before=before, after=after).order_by(
+            ChatMessage.created_at.asc(), ChatMessage.id.asc()
+        )
+        stmt = stmt.execution_options(yield_per=chat_config.HISTORY_STREAM_BATCH)
+
+        async with Session() as db:
+            result = await db.stream(stmt)
+            async for rows in result.partitions():
+                yield "".join(
+                    ChatMessageOut.model_validate(row).model_dump_json() + "\n"
+                    for row in rows
+                )
 
     # TODO: This need to be discussed if we need Vision feature in the app
     async def vision_chat(
@@ -296,20 +609,18 @@ class Chat:
         image_data: str,
     ):
         try:
-            chat_model = ChatOpenAI(
-                openai_api_key=settings.OPENAI_API_KEY, model=GPT4, temperature=0.7
-            )
-
-            message_history = await self.get_message_history()
+            chat_model = get_clients().chat_model(GPT4, temperature=0.7)
 
             message = [
                 {"type": "image_url", "image_url": {"url": image_data}},
                 {"type": "text", "text": user_message},
             ]
+            human_message = HumanMessage(content=message)
 
-            message_history = message_history[-4:]
-
-            message_history.append(HumanMessage(content=message))
+            message_history = await self.get_context_window(
+                reserve_tokens=count_message_tokens(human_message)
+            )
+            message_history.append(human_message)
 
             completion = await chat_model.ainvoke(message_history)
 
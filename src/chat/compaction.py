@@ -0,0 +1,95 @@
+"""Extractive compaction of tool output before it goes back to the model.
+
+Sentences of the output are ranked against the user's question with Okapi
+BM25, scored over the sentences themselves with NumPy, and the best ones are
+kept within a token budget in their original order. Runs locally, there is no
+model call involved.
+"""
+
+import re
+
+import numpy as np
+
+from src.chat.config import chat_config
+from src.chat.context import count_tokens, get_encoding, truncate_tokens
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+_TERM = re.compile(r"\w+")
+
+
+def split_sentences(text: str) -> list[str]:
+    return [
+        sentence.strip()
+        for sentence in _SENTENCE_BOUNDARY.split(text)
+        if sentence.strip()
+    ]
+
+
+def tokenize(text: str) -> list[str]:
+    return _TERM.findall(text.lower())
+
+
+def token_counts(sentences: list[str]) -> np.ndarray:
+    return np.array([len(tokens) for tokens in get_encoding().encode_batch(sentences)])
+
+
+def bm25_scores(sentences: list[list[str]], query: list[str]) -> np.ndarray:
+    """BM25 score of every tokenized sentence for `query`.
+
+    Sentences are the documents, so IDF favours query terms that single out a
+    few sentences over ones that appear everywhere in the output.
+    """
+    lengths = np.array([len(sentence) for sentence in sentences])
+    vocabulary = np.unique(np.array(query, dtype=str))
+    if not len(vocabulary) or not lengths.sum():
+        return np.zeros(len(sentences))
+
+    terms = np.array([term for sentence in sentences for term in sentence], dtype=str)
+    rows = np.repeat(np.arange(len(sentences)), lengths)
+    columns = np.searchsorted(vocabulary, terms).clip(max=len(vocabulary) - 1)
+    matches = vocabulary[columns] == terms
+
+    frequencies = np.zeros((len(sentences), len(vocabulary)))
+    np.add.at(frequencies, (rows[matches], columns[matches]), 1)
+
+    documents = np.count_nonzero(frequencies, axis=0)
+    idf = np.log1p((len(sentences) - documents + 0.5) / (documents + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / lengths.mean())
+    return (frequencies * (BM25_K1 + 1) / (frequencies + norm[:, None])) @ idf
+
+
+def compact(text: str, question: str, max_tokens: int) -> str:
+    """The sentences of `text` most relevant to `question`, within `max_tokens`.
+
+    `text` is returned unchanged when it already fits.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    sentences = split_sentences(text)
+    if not sentences:
+        return text
+
+    scores = bm25_scores(
+        [tokenize(sentence) for sentence in sentences], tokenize(question)
+    )
+    counts = token_counts(sentences)
+
+    # Stable, so equally relevant sentences are taken in reading order.
+    kept, remaining = [], max_tokens
+    for i in np.argsort(-scores, kind="stable"):
+        if counts[i] <= remaining:
+            kept.append(i)
+            remaining -= counts[i]
+    if not kept:
+        return truncate_tokens(text, max_tokens)
+    return "\n".join(sentences[i] for i in sorted(kept))
+
+
+def tool_token_budget(name: str) -> int:
+    return chat_config.TOOL_COMPACTION_TOKENS_PER_TOOL.get(
+        name, chat_config.TOOL_COMPACTION_TOKENS
+    )
@@ -0,0 +1,64 @@
+from pydantic_settings import BaseSettings
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())  # load environment variables from .env file
+
+
+class ChatConfig(BaseSettings):
+    HISTORY_CACHE_TTL: int = 60 * 60  # seconds
+    HISTORY_CACHE_MAX_MESSAGES: int = 200
+    HISTORY_PAGE_SIZE: int = 50
+    HISTORY_PAGE_MAX_SIZE: int = 200
+    HISTORY_STREAM_BATCH: int = 500
+
+    CONTEXT_TOKEN_BUDGET: int = 8000
+    SUMMARY_MAX_TOKENS: int = 1000
+    SUMMARY_BATCH_MESSAGES: int = 50
+    SUMMARY_BATCH_TOKENS: int = 8000
+
+    # Per user and route, each chat turn can fan out to several model calls.
+    CHAT_RATE_LIMIT_CAPACITY: int = 20
+    CHAT_RATE_LIMIT_REFILL: float = 0.5  # requests per second
+    CHAT_RATE_LIMIT_MAX_LOCAL_BUCKETS: int = 10000
+
+    MAX_TOOL_ITERATIONS: int = 5
+    TOOL_MAX_CONCURRENCY: int = 4
+    TOOL_TIMEOUT: float = 120.0  # seconds
+    TOOL_COMPACTION_TOKENS: int = 1500
+    TOOL_COMPACTION_TOKENS_PER_TOOL: dict[str, int] = {}
+    TOOL_REPLAY_TOKEN_BUDGET: int = 4000
+
+    RESEARCH_MAX_CONCURRENCY: int = 16
+    RESEARCH_DOCUMENT_TIMEOUT: float = 90.0  # seconds
+
+    EXA_CACHE_TTL: int = 60 * 60 * 24  # seconds
+    EXA_CACHE_MAX_ENTRIES: int = 5000
+
+    SUMMARY_CACHE_TTL: int = 60 * 60 * 24 * 7  # seconds
+    SUMMARY_CACHE_MAX_ENTRIES: int = 20000
+
+    DOCUMENT_CHUNK_TOKENS: int = 3000
+    DOCUMENT_MAX_CHUNKS: int = 8
+    DOCUMENT_MAP_CONCURRENCY: int = 4
+    DOCUMENT_MAP_MODEL: str = "gpt-3.5-turbo-0125"
+
+    IMAGE_CACHE_MAX_AGE: int = 60 * 60 * 24 * 365  # seconds
+    IMAGE_STREAM_CHUNK_SIZE: int = 64 * 1024  # bytes
+    IMAGE_GC_INTERVAL: int = 60 * 60  # seconds
+    IMAGE_GC_GRACE: int = 60 * 60 * 24  # seconds
+    IMAGE_GC_BATCH: int = 500
+
+    THUMBNAIL_SIZE: int = 512  # pixels, longest side
+    THUMBNAIL_WORKERS: int = 2  # processes
+    THUMBNAIL_QUEUE_SIZE: int = 1000
+    THUMBNAIL_SWEEP_INTERVAL: int = 5 * 60  # seconds
+    THUMBNAIL_MAX_ATTEMPTS: int = 3
+
+    GREETING_POOL_SIZE: int = 10
+    GREETING_POOL_TTL: int = 60 * 60 * 24  # seconds
+    GREETING_POOL_MAX_VERSIONS: int = 16
+    GREETING_REFRESH_INTERVAL: int = 60 * 60 * 6  # seconds
+    GREETING_TEMPERATURE: float = 1.0
+
+
+chat_config = ChatConfig()
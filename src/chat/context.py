@@ -0,0 +1,347 @@
+import json
+import uuid  # type: ignore
+import asyncio
+import logging
+import tiktoken
+
+from functools import lru_cache  # type: ignore
+from itertools import groupby  # type: ignore
+from datetime import datetime  # type: ignore
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db import Session
+from src.clients import get_clients
+from src.chat.config import chat_config
+from src.chat.models import ChatMessage, ChatRole, ChatSummary, ChatToolCall
+
+logger = logging.getLogger(__name__)
+
+GPT4 = "gpt-4o"
+GPT3 = "gpt-3.5-turbo-0125"
+
+# Fixed per-message framing overhead charged by the chat completions API.
+MESSAGE_OVERHEAD_TOKENS = 4
+# Cost of a single 1024x1024 `high` detail image input.
+IMAGE_TOKEN_ESTIMATE = 765
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a user and a sales support assistant.
+
+Current summary:
+{summary}
+
+----------
+New conversation lines:
+{transcript}
+
+----------
+Update the summary with the new lines. Keep every fact, number, requirement and decision the user shared or was given. Drop greetings and small talk.
+Respond only with the updated summary in at most {max_tokens} tokens.
+"""
+
+HistoryEntry = tuple[str, str, datetime | None]
+
+# Strong references to in-flight summary updates, keyed by session id, so the
+# tasks are not garbage collected and each session has at most one running.
+_summary_tasks: dict[uuid.UUID, asyncio.Task] = {}
+
+
+@lru_cache
+def get_encoding(model: str = GPT4) -> tiktoken.Encoding:
+    return tiktoken.encoding_for_model(model)
+
+
+def count_tokens(text: str, model: str = GPT4) -> int:
+    return len(get_encoding(model).encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = GPT4) -> str:
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def count_message_tokens(message: BaseMessage, model: str = GPT4) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += count_tokens(tool_call["name"] + json.dumps(tool_call["args"]), model)
+
+    content = message.content
+    if isinstance(content, str):
+        return tokens + count_tokens(content, model)
+
+    for part in content:
+        if isinstance(part, str):
+            tokens += count_tokens(part, model)
+        elif part.get("type") == "text":
+            tokens += count_tokens(part["text"], model)
+        elif part.get("type") == "image_url":
+            tokens += IMAGE_TOKEN_ESTIMATE
+    return tokens
+
+
+MESSAGE_TYPES: dict[str, type[BaseMessage]] = {
+    "user": HumanMessage,
+    "assistant": AIMessage,
+    "system": SystemMessage,
+}
+
+
+def to_langchain_message(role: str, content: str) -> BaseMessage | None:
+    message_type = MESSAGE_TYPES.get(role)
+    return message_type(content=content) if message_type else None
+
+
+def to_langchain_messages(entries: list[HistoryEntry]) -> list[BaseMessage]:
+    return [
+        MESSAGE_TYPES[role](content=content)
+        for role, content, _ in entries
+        if role in MESSAGE_TYPES
+    ]
+
+
+def build_context_window(
+    entries: list[HistoryEntry],
+    system_prompt: str,
+    summary: ChatSummary | None = None,
+    budget: int = chat_config.CONTEXT_TOKEN_BUDGET,
+    tool_exchanges: dict[datetime, list[BaseMessage]] | None = None,
+    tool_budget: int = chat_config.TOOL_REPLAY_TOKEN_BUDGET,
+    truncated: bool = False,
+) -> tuple[list[BaseMessage], datetime | None]:
+    """Assemble the prompt for the next completion within `budget` tokens.
+
+    `system_prompt` always comes first, so every turn of a session starts with
+    the same prefix; system prompts stored in the history by older versions
+    are skipped. It is followed by the running summary and then as many of the
+    most recent turns as fit; turns already folded into the summary are
+    skipped. The `tool_exchanges` of kept assistant turns, keyed by their
+    `created_at`, are replayed ahead of them, newest first, for as long as
+    they fit in `tool_budget` and what is left of `budget`.
+
+    Returns the messages and, when unsummarized turns had to be dropped, the
+    `created_at` of the oldest kept turn so the caller knows what still has to
+    be folded into the summary. `truncated` says `entries` were cut off at a
+    load limit, in which case the turns before the oldest entry count as
+    dropped too.
+    """
+    summarized_until = summary.summarized_until if summary else None
+
+    turns: list[tuple[BaseMessage, datetime | None]] = []
+    for role, content, created_at in entries:
+        if role == "system":
+            continue
+        elif summarized_until and created_at and created_at <= summarized_until:
+            continue
+        elif message := to_langchain_message(role, content):
+            turns.append((message, created_at))
+
+    head: list[BaseMessage] = [SystemMessage(content=system_prompt)]
+    if summary and summary.summary:
+        head.append(
+            SystemMessage(
+                content=f"Summary of the earlier conversation:\n{summary.summary}"
+            )
+        )
+
+    remaining = budget - sum(count_message_tokens(message) for message in head)
+    kept: list[tuple[BaseMessage, datetime | None]] = []
+    for message, created_at in reversed(turns):
+        tokens = count_message_tokens(message)
+        # The newest turn is always sent, even when it alone exceeds the budget.
+        if kept and tokens > remaining:
+            break
+        remaining -= tokens
+        kept.append((message, created_at))
+
+    # `kept` is newest first, so recent research wins the tool budget.
+    tool_remaining = min(tool_budget, remaining)
+    window: list[BaseMessage] = []
+    for message, created_at in kept:
+        window.append(message)
+        if not isinstance(message, AIMessage) or not tool_exchanges:
+            continue
+        # An exchange is replayed whole, the API rejects unanswered calls.
+        exchange = tool_exchanges.get(created_at, [])
+        tokens = sum(count_message_tokens(tool_message) for tool_message in exchange)
+        if exchange and tokens <= tool_remaining:
+            tool_remaining -= tokens
+            window.extend(reversed(exchange))
+
+    window.reverse()
+    cutoff = None
+    if len(kept) < len(turns):
+        cutoff = kept[-1][1]
+    elif truncated and entries and entries[0][2]:
+        oldest = entries[0][2]
+        if not summarized_until or oldest > summarized_until:
+            cutoff = oldest
+    return head + window, cutoff
+
+
+def store_tool_calls(
+    db: AsyncSession,
+    message: ChatMessage,
+    tool_steps: list[tuple[AIMessage, list[ToolMessage]]],
+):
+    """Add the tool calls that led to `message`, with their outputs.
+
+    The outputs are stored as the model saw them, already compacted by
+    `Chat.run_tool_calls`.
+    """
+    for step, (completion, tool_messages) in enumerate(tool_steps):
+        outputs = {
+            tool_message.tool_call_id: str(tool_message.content)
+            for tool_message in tool_messages
+        }
+        for position, tool_call in enumerate(completion.tool_calls):
+            db.add(
+                ChatToolCall(
+                    message_id=message.id,
+                    session_id=message.session_id,
+                    step=step,
+                    position=position,
+                    tool_call_id=tool_call["id"],
+                    name=tool_call["name"],
+                    args=tool_call["args"],
+                    output=outputs.get(tool_call["id"], ""),
+                    created_at=message.created_at,
+                    updated_at=message.created_at,
+                )
+            )
+
+
+async def load_tool_exchanges(
+    db: AsyncSession, session_id: uuid.UUID, since: datetime | None = None
+) -> dict[datetime, list[BaseMessage]]:
+    """Stored tool calls of the session as replayable messages.
+
+    Keyed by the `created_at` of the assistant message they led to, each value
+    holds one `AIMessage` with the calls of a step followed by its
+    `ToolMessage` answers, step after step.
+    """
+    stmt = (
+        select(
+            ChatToolCall.created_at,
+            ChatToolCall.step,
+            ChatToolCall.tool_call_id,
+            ChatToolCall.name,
+            ChatToolCall.args,
+            ChatToolCall.output,
+        )
+        .where(ChatToolCall.session_id == session_id)
+        .order_by(ChatToolCall.created_at, ChatToolCall.step, ChatToolCall.position)
+    )
+    if since is not None:
+        stmt = stmt.where(ChatToolCall.created_at >= since)
+
+    exchanges: dict[datetime, list[BaseMessage]] = {}
+    rows = (await db.execute(stmt)).all()
+    for (created_at, _), calls in groupby(rows, key=lambda row: row[:2]):
+        calls = list(calls)
+        exchange = exchanges.setdefault(created_at, [])
+        exchange.append(
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": call.name, "args": call.args, "id": call.tool_call_id}
+                    for call in calls
+                ],
+            )
+        )
+        exchange.extend(
+            ToolMessage(call.output, tool_call_id=call.tool_call_id) for call in calls
+        )
+    return exchanges
+
+
+async def get_summary(db: AsyncSession, session_id: uuid.UUID) -> ChatSummary | None:
+    stmt = select(ChatSummary).where(ChatSummary.session_id == session_id)
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+def schedule_summary_update(session_id: uuid.UUID, cutoff: datetime):
+    """Fold turns older than `cutoff` into the summary without blocking the turn."""
+    if (task := _summary_tasks.get(session_id)) and not task.done():
+        return
+
+    task = asyncio.create_task(update_summary(session_id, cutoff))
+    _summary_tasks[session_id] = task
+    task.add_done_callback(lambda _: _summary_tasks.pop(session_id, None))
+
+
+async def update_summary(session_id: uuid.UUID, cutoff: datetime):
+    """Fold the next batch of unsummarized turns before `cutoff` into the summary.
+
+    Runs in its own session because the request session is closed by the time
+    the background task gets to run. At most `SUMMARY_BATCH_MESSAGES` turns
+    and `SUMMARY_BATCH_TOKENS` tokens are folded per call, later turns pick up
+    the rest.
+    """
+    try:
+        async with Session() as db:
+            chat_summary = await get_summary(db, session_id)
+            if chat_summary is None:
+                chat_summary = ChatSummary(session_id=session_id, summary="")
+                db.add(chat_summary)
+
+            stmt = (
+                select(ChatMessage.role, ChatMessage.message, ChatMessage.created_at)
+                .where(
+                    (ChatMessage.session_id == session_id)
+                    & (ChatMessage.role.in_([ChatRole.ASSISTANT, ChatRole.USER]))
+                    & (ChatMessage.created_at < cutoff)
+                )
+                .order_by(ChatMessage.created_at.asc())
+                .limit(chat_config.SUMMARY_BATCH_MESSAGES)
+            )
+            if chat_summary.summarized_until is not None:
+                stmt = stmt.where(
+                    ChatMessage.created_at > chat_summary.summarized_until
+                )
+
+            rows = (await db.execute(stmt)).all()
+            if not rows:
+                return
+
+            lines, tokens = [], 0
+            for role, message, created_at in rows:
+                line = truncate_tokens(
+                    f"{role.value}: {message}", chat_config.SUMMARY_BATCH_TOKENS
+                )
+                tokens += count_tokens(line)
+                if lines and tokens > chat_config.SUMMARY_BATCH_TOKENS:
+                    break
+                lines.append(line)
+                folded_until = created_at
+
+            transcript = "\n".join(lines)
+            chat_model = get_clients().chat_model(GPT3)
+            completion = await chat_model.ainvoke(
+                [
+                    SystemMessage(
+                        content=SUMMARY_SYSTEM_PROMPT.format(
+                            summary=chat_summary.summary or "(empty)",
+                            transcript=transcript,
+                            max_tokens=chat_config.SUMMARY_MAX_TOKENS,
+                        )
+                    )
+                ]
+            )
+
+            chat_summary.summary = completion.content
+            chat_summary.summarized_until = folded_until
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Error updating chat summary: {e}")
@@ -0,0 +1,38 @@
+import uuid  # type: ignore
+
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db import get_db
+from src.chat import services
+from src.rate_limit import RateLimiter
+from src.chat.config import chat_config
+from src.chat.models import ChatSession
+from src.chat.exceptions import ChatSessionNotFound
+from src.auth.schemas import JWTData
+from src.auth.jwt import parse_jwt_user_data
+
+rate_limiter = RateLimiter(
+    "chat",
+    capacity=chat_config.CHAT_RATE_LIMIT_CAPACITY,
+    refill=chat_config.CHAT_RATE_LIMIT_REFILL,
+    max_local_buckets=chat_config.CHAT_RATE_LIMIT_MAX_LOCAL_BUCKETS,
+)
+
+
+async def rate_limit_user(
+    request: Request, user: JWTData = Depends(parse_jwt_user_data)
+) -> None:
+    await rate_limiter.check(request, str(user.user_id))
+
+
+async def valid_chat_session(
+    session_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user: JWTData = Depends(parse_jwt_user_data),
+) -> ChatSession:
+    chat_session = await services.get_chat_session(db, session_id, user.user_id)
+    if not chat_session:
+        raise ChatSessionNotFound()
+
+    return chat_session
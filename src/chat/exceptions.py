@@ -0,0 +1,9 @@
+from src.exceptions import BadRequest, NotFound
+
+
+class ChatSessionNotFound(NotFound):
+    DETAIL = "Chat session not found"
+
+
+class InvalidCursor(BadRequest):
+    DETAIL = "Invalid pagination cursor"
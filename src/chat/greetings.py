@@ -0,0 +1,97 @@
+"""Pre-generated greetings for `/chat/start`.
+
+A new chat opens with the model greeting the user from nothing but the system
+prompt, so the reply does not depend on who asks. A pool of greetings is kept
+per system prompt version and refreshed in the background; starting a chat
+picks one at random and only calls the model when the pool is empty.
+"""
+
+import random
+import asyncio
+import hashlib
+import logging
+
+from langchain_core.messages import SystemMessage
+
+from src.cache import Cache
+from src.clients import get_clients
+from src.chat.config import chat_config
+
+logger = logging.getLogger(__name__)
+
+GPT4 = "gpt-4o"
+
+# One entry per system prompt version, in Redis when available.
+greeting_cache = Cache(
+    "greeting",
+    ttl=chat_config.GREETING_POOL_TTL,
+    max_entries=chat_config.GREETING_POOL_MAX_VERSIONS,
+)
+
+# Strong references to in-flight refreshes, at most one per prompt version.
+_refresh_tasks: dict[str, asyncio.Task] = {}
+
+
+def prompt_version(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+
+
+async def generate_greetings(system_prompt: str) -> list[str]:
+    """`GREETING_POOL_SIZE` greetings for `system_prompt`, in one completion call."""
+    chat_model = get_clients().chat_model(
+        GPT4,
+        n=chat_config.GREETING_POOL_SIZE,
+        temperature=chat_config.GREETING_TEMPERATURE,
+    )
+    result = await chat_model.agenerate([[SystemMessage(content=system_prompt)]])
+    return [generation.text for generation in result.generations[0] if generation.text]
+
+
+async def refresh_greetings(system_prompt: str) -> list[str]:
+    greetings = await generate_greetings(system_prompt)
+    if greetings:
+        await greeting_cache.set(prompt_version(system_prompt), greetings)
+    return greetings
+
+
+def schedule_greeting_refresh(system_prompt: str):
+    """Refill the pool of `system_prompt` in the background, once at a time."""
+    version = prompt_version(system_prompt)
+    if version in _refresh_tasks:
+        return
+
+    async def refresh():
+        try:
+            await refresh_greetings(system_prompt)
+        except Exception as e:
+            logger.error(f"Error refreshing greetings: {e}")
+
+    task = asyncio.create_task(refresh())
+    _refresh_tasks[version] = task
+    task.add_done_callback(lambda _: _refresh_tasks.pop(version, None))
+
+
+async def get_greeting(system_prompt: str) -> str | None:
+    """A pooled greeting for `system_prompt`, `None` when the pool is empty.
+
+    An empty pool, e.g. for a prompt version not seen before, is refilled in
+    the background while the caller falls back to a live completion.
+    """
+    greetings = await greeting_cache.get(prompt_version(system_prompt))
+    if greetings:
+        greeting_cache.hits += 1
+        return random.choice(greetings)
+
+    greeting_cache.misses += 1
+    schedule_greeting_refresh(system_prompt)
+    return None
+
+
+async def run_greeting_refresh(system_prompt: str):
+    """Regenerate the pool of `system_prompt` every `GREETING_REFRESH_INTERVAL`."""
+    while True:
+        try:
+            await refresh_greetings(system_prompt)
+        except Exception as e:
+            logger.error(f"Error refreshing greetings: {e}")
+        await asyncio.sleep(chat_config.GREETING_REFRESH_INTERVAL)
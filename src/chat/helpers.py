@@ -1,12 +1,18 @@
-import os
+import time
+import asyncio
+import hashlib
 import logging
 import tiktoken
 
-from exa_py import Exa
-from openai import OpenAI
+from typing import Iterator  # type: ignore
 from langchain_core.tools import tool
 from dotenv import load_dotenv, find_dotenv
 
+from src.clients import get_clients
+from src.cache import Cache, compress, decompress
+from src.chat.config import chat_config
+from src.chat.research import normalize_query, research
+
 logger = logging.getLogger(__name__)
 
 load_dotenv(find_dotenv())
@@ -14,6 +20,15 @@ load_dotenv(find_dotenv())
 GPT4 = "gpt-4o"
 GPT3 = "gpt-3.5-turbo-0125"
 
+# Values are stored already compressed, in Redis and in the local fallback.
+summary_cache = Cache(
+    "summary",
+    ttl=chat_config.SUMMARY_CACHE_TTL,
+    max_entries=chat_config.SUMMARY_CACHE_MAX_ENTRIES,
+    dumps=str,
+    loads=str,
+)
+
 SUMMERIZATION_SYSTEM_PROMPT = """{text}
 
 ----------
@@ -34,58 +49,121 @@ You need to create summaries considering all the mentioned conditions. Moreover,
 """
 
 
-def restrict_tokens(text: str) -> str:
+CHUNK_SUMMARIZATION_PROMPT = """{text}
+
+----------
+The above is one part of a longer document. Extract everything in it that helps answer the following question:
+
+> {question}
+
+----------
+Keep all factual information, numbers, stats, company names, customer pain points, market drivers and restraints. Respond only with the extracted points.
+"""
+
+
+def iter_token_chunks(
+    text: str,
+    chunk_tokens: int = chat_config.DOCUMENT_CHUNK_TOKENS,
+    max_chunks: int = chat_config.DOCUMENT_MAX_CHUNKS,
+) -> Iterator[str]:
+    """Yield `text` in pieces of `chunk_tokens` tokens, at most `max_chunks`.
+
+    The text is encoded line by line so encoding stops as soon as the last
+    chunk is full instead of tokenizing the whole document up front.
+    """
     enc = tiktoken.get_encoding("cl100k_base")
-    encoded_text = enc.encode(text)
-
-    if len(encoded_text) > 10000:
-        encoded_text = encoded_text[:8000]
-        text = enc.decode(encoded_text)
-
-    return text
-
-
-def create_summery(text: str, question: str):
-    try:
-        client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model=GPT3,
-            messages=[
-                {
-                    "role": "system",
-                    "content": SUMMERIZATION_SYSTEM_PROMPT.format(
-                        text=restrict_tokens(text), question=question
-                    ),
-                }
-            ],
+    buffer: list[int] = []
+    chunks = 0
+    for line in text.splitlines(keepends=True):
+        buffer.extend(enc.encode(line))
+        while len(buffer) >= chunk_tokens:
+            yield enc.decode(buffer[:chunk_tokens])
+            chunks += 1
+            if chunks == max_chunks:
+                return
+            buffer = buffer[chunk_tokens:]
+
+    if buffer:
+        yield enc.decode(buffer)
+
+
+async def complete(prompt: str, model: str = GPT3) -> str:
+    client = get_clients().openai
+    response = await client.chat.completions.create(
+        model=model, messages=[{"role": "system", "content": prompt}]
+    )
+    return response.choices[0].message.content
+
+
+async def map_reduce_summary(chunks: list[str], question: str) -> str:
+    """Summarize `chunks` in parallel, then reduce them into one answer.
+
+    A single chunk skips the map stage. Map and reduce latency are logged
+    separately per document.
+    """
+    if len(chunks) == 1:
+        return await complete(
+            SUMMERIZATION_SYSTEM_PROMPT.format(text=chunks[0], question=question)
+        )
+
+    fan_out = asyncio.Semaphore(chat_config.DOCUMENT_MAP_CONCURRENCY)
+
+    async def summarize_chunk(chunk: str) -> str:
+        async with fan_out:
+            return await complete(
+                CHUNK_SUMMARIZATION_PROMPT.format(text=chunk, question=question),
+                model=chat_config.DOCUMENT_MAP_MODEL,
+            )
+
+    start = time.perf_counter()
+    partial_summaries = await asyncio.gather(*map(summarize_chunk, chunks))
+    map_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = await complete(
+        SUMMERIZATION_SYSTEM_PROMPT.format(
+            text="\n\n".join(partial_summaries), question=question
         )
-        return response.choices[0].message.content
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": str(e),
-            "code": "ERR_GENERATION_INTERRUPTED",
-        }
+    )
+    reduce_seconds = time.perf_counter() - start
+
+    logger.info(
+        f"Summarized document in {len(chunks)} chunks: "
+        f"map {map_seconds:.2f}s, reduce {reduce_seconds:.2f}s"
+    )
+    return summary
+
+
+async def create_summery(text: str, question: str) -> str:
+    # Tokenizing a long page is CPU bound, keep it off the event loop.
+    chunks = await asyncio.to_thread(lambda: list(iter_token_chunks(text)))
+
+    async def summarize() -> str:
+        return compress(await map_reduce_summary(chunks, question))
+
+    key = hashlib.sha256(
+        "\0".join([normalize_query(question), *chunks]).encode()
+    ).hexdigest()
+    return decompress(await summary_cache.get_or_set(key, summarize))
 
 
 @tool
-def exa_search(query: str):
+async def exa_search(query: str):
     """
     Perform a search using the Exa API and return the results as a single string.
     This function uses the Exa API to search for the given query and retrieves
-    the contents of the top 2 results. The results are then concatenated into
-    a single string with each result separated by a newline.
+    the contents of the top 5 results, which are summarized concurrently. The
+    summaries are then concatenated into a single string with each summary
+    separated by a newline.
     :param query: The search query string.
-    :return: A string containing the concatenated text of the top 2 search results.
+    :return: A string containing the concatenated summaries of the top 5 search results.
     """
-    exa = Exa(api_key=os.environ.get("EXA_API_KEY"))
-    exa_response = exa.search_and_contents(query, num_results=5)
-    summery = [create_summery(text.text, query) for text in exa_response.results]
+    summery = await research(query, create_summery, num_results=5)
     return "\n".join(summery)
 
 
 @tool
-def get_generated_image(prompt: str, number_of_images: int):
+async def get_generated_image(prompt: str, number_of_images: int):
     """
     Generate images based on a given prompt using the OpenAI API.
     This function interacts with the OpenAI API to generate images based on the provided prompt.
@@ -95,9 +173,9 @@ def get_generated_image(prompt: str, number_of_images: int):
     :param number_of_images: The number of images to generate. If greater than 1, multiple images will be generated.
     :return: A string containing the URLs of the generated images. If multiple images are generated, the URLs are concatenated with a space separator.
     """
-    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    client = get_clients().openai
     if number_of_images > 1:
-        image_response = client.images.generate(
+        image_response = await client.images.generate(
             model="dall-e-2",
             prompt=f"Create an image of {prompt}",
             size="512x512",
@@ -105,7 +183,7 @@ def get_generated_image(prompt: str, number_of_images: int):
             response_format="url",
         )
         return " ".join([i.url for i in image_response.data])
-    image_response = client.images.generate(
+    image_response = await client.images.generate(
         model="dall-e-3",
         prompt=f"Create an image of {prompt}",
         size="1024x1024",
@@ -0,0 +1,42 @@
+"""Pillow work for chat images, run in the thumbnail process pool.
+
+Only depends on Pillow so pool workers stay cheap to start.
+"""
+
+import io
+
+from PIL import Image, UnidentifiedImageError
+
+THUMBNAIL_FORMAT = "PNG"
+THUMBNAIL_MODES = ("1", "L", "LA", "P", "RGB", "RGBA")
+
+
+def inspect_image(content: bytes | str) -> tuple[int, int, str]:
+    """Return `(width, height, content_type)`, `ValueError` if not an image.
+
+    `content` is the image itself or the path of a file holding it, which
+    Pillow then reads in chunks.
+    """
+    source = io.BytesIO(content) if isinstance(content, bytes) else content
+    try:
+        with Image.open(source) as image:
+            width, height, image_format = image.width, image.height, image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise ValueError(f"Invalid image: {e}") from e
+
+    return width, height, Image.MIME.get(image_format, "application/octet-stream")
+
+
+def make_thumbnail(content: bytes, size: tuple[int, int]) -> tuple[bytes, int, int]:
+    """Return the thumbnail of `content` bounded by `size`, with its dimensions."""
+    with Image.open(io.BytesIO(content)) as image:
+        # PNG cannot hold every mode, e.g. the CMYK of print JPEGs, and some
+        # such as 16-bit greyscale cannot be resized either.
+        if image.mode not in THUMBNAIL_MODES:
+            transparent = "A" in image.mode or "transparency" in image.info
+            image = image.convert("RGBA" if transparent else "RGB")
+        image.thumbnail(size)
+        output = io.BytesIO()
+        image.save(output, THUMBNAIL_FORMAT)
+        return output.getvalue(), image.width, image.height
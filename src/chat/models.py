@@ -2,11 +2,12 @@ from __future__ import annotations
 
 import enum  # type: ignore
 import uuid  # type: ignore
+import datetime  # type: ignore
 from typing import TYPE_CHECKING  # type: ignore
 
 import sqlalchemy as sa
 from sqlalchemy_file.file import File
-from sqlalchemy_file.types import ImageField
+from sqlalchemy_file.types import FileField, ImageField
 from sqlalchemy_file.validators import SizeValidator
 from sqlalchemy import ForeignKey, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -14,7 +15,6 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from src.db.base import Base, CreatedUpdatedMixin
 from src.config import settings
 
-
 if TYPE_CHECKING:
     from src.auth import models as auth_models
 
@@ -25,8 +25,39 @@ class ChatRole(str, enum.Enum):
     SYSTEM = "system"
 
 
+class ChatSession(Base, CreatedUpdatedMixin):
+    """One conversation thread, every `ChatMessage` belongs to exactly one."""
+
+    __tablename__ = "chat_session"
+    __table_args__ = (
+        sa.Index("chat_session_user_id_created_at_idx", "user_id", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        primary_key=True, server_default=func.uuid_generate_v4()
+    )
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        sa.UUID, ForeignKey("auth_user.id"), nullable=False
+    )
+    # Key into `src.chat.prompts.SYSTEM_PROMPTS`, the prompt is not stored.
+    system_prompt_version: Mapped[str] = mapped_column(sa.String, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ChatSession {self.id} of user {self.user_id}>"
+
+
 class ChatMessage(Base, CreatedUpdatedMixin):
     __tablename__ = "chat_message"
+    # History is always read per thread in `(created_at, id)` keyset order.
+    __table_args__ = (
+        sa.Index(
+            "chat_message_session_id_created_at_id_idx",
+            "session_id",
+            "created_at",
+            "id",
+        ),
+        sa.Index("chat_message_user_id_created_at_idx", "user_id", "created_at"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         primary_key=True, server_default=func.uuid_generate_v4()
@@ -34,6 +65,9 @@ class ChatMessage(Base, CreatedUpdatedMixin):
     user_id: Mapped[uuid.UUID] = mapped_column(
         sa.UUID, ForeignKey("auth_user.id"), nullable=False
     )
+    session_id: Mapped[uuid.UUID] = mapped_column(
+        sa.UUID, ForeignKey("chat_session.id"), nullable=False
+    )
     message: Mapped[str] = mapped_column(sa.Text, nullable=False)
     role: Mapped[ChatRole] = mapped_column(
         sa.Enum(ChatRole, name="chat_role"), nullable=False
@@ -47,17 +81,110 @@ class ChatMessage(Base, CreatedUpdatedMixin):
         return f"<ChatMessage {self.id} from user {self.user_id}>"
 
 
+class ChatToolCall(Base, CreatedUpdatedMixin):
+    """A tool call made while producing an assistant message, and its output.
+
+    Replayed ahead of that message on later turns so the model keeps the
+    research it already did. `created_at` is copied from the message.
+    """
+
+    __tablename__ = "chat_tool_call"
+    __table_args__ = (
+        sa.Index(
+            "chat_tool_call_session_id_created_at_idx", "session_id", "created_at"
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        primary_key=True, server_default=func.uuid_generate_v4()
+    )
+    message_id: Mapped[uuid.UUID] = mapped_column(
+        sa.UUID,
+        ForeignKey("chat_message.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    session_id: Mapped[uuid.UUID] = mapped_column(
+        sa.UUID, ForeignKey("chat_session.id"), nullable=False
+    )
+    # Round of the tool loop, and order of the call within it.
+    step: Mapped[int] = mapped_column(nullable=False)
+    position: Mapped[int] = mapped_column(nullable=False)
+    tool_call_id: Mapped[str] = mapped_column(sa.String, nullable=False)
+    name: Mapped[str] = mapped_column(sa.String, nullable=False)
+    args: Mapped[dict] = mapped_column(sa.JSON, nullable=False)
+    # Compacted to the tool's `TOOL_COMPACTION_TOKENS` budget, as the model saw it.
+    output: Mapped[str] = mapped_column(sa.Text, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ChatToolCall {self.name} for message {self.message_id}>"
+
+
+class ChatSummary(Base, CreatedUpdatedMixin):
+    __tablename__ = "chat_summary"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        primary_key=True, server_default=func.uuid_generate_v4()
+    )
+    session_id: Mapped[uuid.UUID] = mapped_column(
+        sa.UUID, ForeignKey("chat_session.id"), unique=True, nullable=False
+    )
+    summary: Mapped[str] = mapped_column(sa.Text, nullable=False, server_default="")
+    # `created_at` of the newest message already folded into `summary`
+    summarized_until: Mapped[datetime.datetime | None] = mapped_column(
+        sa.DateTime, nullable=True
+    )
+
+    def __repr__(self) -> str:
+        return f"<ChatSummary {self.id} for session {self.session_id}>"
+
+
+class ImageBlob(Base, CreatedUpdatedMixin):
+    """Image content stored once per SHA-256, shared by every `ChatImage`."""
+
+    __tablename__ = "image_blob"
+
+    sha256: Mapped[str] = mapped_column(sa.String(64), primary_key=True)
+
+    # Validated and thumbnailed off the event loop, see `src.chat.thumbnails`.
+    file: Mapped[File] = mapped_column(
+        FileField(
+            validators=[SizeValidator(max_size=settings.MAX_IMAGE_UPLOAD_SIZE)],
+        ),
+        nullable=False,
+    )
+    # `file_id`, `width`, `height` and `path` of the thumbnail, once generated
+    thumbnail: Mapped[dict | None] = mapped_column(sa.JSON, nullable=True)
+    # failed thumbnail attempts, the sweep gives up at `THUMBNAIL_MAX_ATTEMPTS`
+    thumbnail_attempts: Mapped[int] = mapped_column(
+        nullable=False, server_default="0"
+    )
+    # number of `ChatImage` rows pointing here, reclaimed by the GC at zero
+    ref_count: Mapped[int] = mapped_column(nullable=False, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"<ImageBlob {self.sha256} ({self.ref_count} refs)>"
+
+
 class ChatImage(Base, CreatedUpdatedMixin):
     __tablename__ = "chat_images"
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
-    file: Mapped[File] = mapped_column(
+    # Only set on rows stored before `ImageBlob`, newer rows reference a blob.
+    file: Mapped[File | None] = mapped_column(
         ImageField(
             thumbnail_size=(512, 512),
             validators=[SizeValidator(max_size=settings.MAX_IMAGE_UPLOAD_SIZE)],
         ),
-        nullable=False,
+        nullable=True,
+    )
+    blob_sha256: Mapped[str | None] = mapped_column(
+        ForeignKey("image_blob.sha256"), nullable=True, index=True
+    )
+
+    chat_id: Mapped[uuid.UUID | None] = mapped_column(
+        ForeignKey("chat_message.id"), nullable=True
     )
 
-    chat_id: Mapped[int] = mapped_column(ForeignKey("chat_message.id"), nullable=True)
+    blob: Mapped[ImageBlob | None] = relationship("ImageBlob")
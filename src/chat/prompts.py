@@ -0,0 +1,35 @@
+"""Versioned system prompts.
+
+A session records the version it was started with instead of a copy of the
+prompt in its history, and every completion is sent with that prompt as its
+single leading system message. Released versions are never edited, since
+that would change the prompt of running sessions and invalidate the provider
+side prompt cache; add a new version and point `CURRENT_SYSTEM_PROMPT_VERSION`
+at it instead.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPTS: dict[str, str] = {
+    "sales-v1": (
+        "You are Sales chatbot AI conversational assistant."
+        "You are an expert in business strategy. "
+        "Done share any text from previous messages with the user."
+        "Greet the user and ask them how you can help them."
+        "Keep the conversation short and concise along with making it interesting."
+    ),
+}
+
+CURRENT_SYSTEM_PROMPT_VERSION = "sales-v1"
+
+
+def get_system_prompt(version: str | None = None) -> str:
+    """The prompt of `version`, the current one if not given or unknown."""
+    if version is None:
+        version = CURRENT_SYSTEM_PROMPT_VERSION
+    if (prompt := SYSTEM_PROMPTS.get(version)) is None:
+        logger.warning(f"Unknown system prompt version {version}, using current")
+        prompt = SYSTEM_PROMPTS[CURRENT_SYSTEM_PROMPT_VERSION]
+    return prompt
@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+import logging
+
+from typing import Any, Awaitable, Callable  # type: ignore
+
+from src.cache import Cache
+from src.clients import get_clients
+from src.chat.config import chat_config
+
+logger = logging.getLogger(__name__)
+
+# Process-wide cap on documents being processed at once, so a burst of
+# research requests cannot open an unbounded number of upstream LLM calls.
+_document_slots = asyncio.Semaphore(chat_config.RESEARCH_MAX_CONCURRENCY)
+
+
+search_cache = Cache(
+    "exa_search",
+    ttl=chat_config.EXA_CACHE_TTL,
+    max_entries=chat_config.EXA_CACHE_MAX_ENTRIES,
+)
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, whitespace and trailing punctuation so rephrasings share a key."""
+    return " ".join(query.lower().split()).rstrip("?!.")
+
+
+async def search(query: str, num_results: int) -> list[dict[str, Any]]:
+    async def search_and_contents() -> list[dict[str, Any]]:
+        exa = get_clients().exa
+        exa_response = await exa.search_and_contents(query, num_results=num_results)
+        return [
+            {"url": result.url, "title": result.title, "text": result.text}
+            for result in exa_response.results
+        ]
+
+    key = hashlib.sha256(f"{normalize_query(query)}|{num_results}".encode()).hexdigest()
+    return await search_cache.get_or_set(key, search_and_contents)
+
+
+async def research(
+    query: str,
+    process: Callable[[str, str], Awaitable[str | None]],
+    num_results: int = 5,
+) -> list[str]:
+    """Search Exa for `query` and run `process(text, query)` on every result.
+
+    Documents are processed concurrently as soon as the search returns, within
+    the shared `RESEARCH_MAX_CONCURRENCY` limit and `RESEARCH_DOCUMENT_TIMEOUT`
+    each. A document that fails or times out is logged and left out, the
+    remaining outputs are returned in search rank order.
+    """
+    results = await search(query, num_results)
+
+    async def run(result: dict[str, Any]) -> str | None:
+        if not result["text"]:
+            return None
+
+        async with _document_slots:
+            try:
+                return await asyncio.wait_for(
+                    process(result["text"], query),
+                    timeout=chat_config.RESEARCH_DOCUMENT_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Timed out processing {result['url']}")
+            except Exception as e:
+                logger.error(f"Error processing {result['url']}: {e}")
+            return None
+
+    outputs = await asyncio.gather(*(run(result) for result in results))
+    return [output for output in outputs if output]
@@ -1,25 +1,52 @@
+import uuid  # type: ignore
 import logging
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, HTTPException, Depends, Body, Request
+from fastapi import APIRouter, HTTPException, Depends, Body, Request, Header, Query
+from fastapi.responses import Response, StreamingResponse
 
 
 from src.db import get_db
 from src.chat.chat import Chat
-from src.auth import models as auth_models
-from src.auth import dependencies as auth_deps
+from src.chat.models import ChatSession
+from src.chat.dependencies import rate_limit_user, valid_chat_session
+from src.chat.config import chat_config
+from src.chat.schemas import ChatMessagePage
+from src.chat.services import (
+    decode_cursor,
+    get_stored_image,
+    iter_stored_file,
+    parse_range,
+)
+from src.chat.thumbnails import thumbnail_id
+from src.auth.schemas import JWTData
+from src.auth.jwt import parse_jwt_user_data
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Disable proxy buffering so events reach the client as they are produced.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
-@router.post("/chat/start")
+IMAGE_CACHE_CONTROL = f"public, max-age={chat_config.IMAGE_CACHE_MAX_AGE}, immutable"
+
+
+@router.post("/chat/start", dependencies=[Depends(rate_limit_user)])
 async def create_chat(
+    request: Request,
+    streaming: bool = False,
     db: AsyncSession = Depends(get_db),
-    user: auth_models.RefreshToken = Depends(auth_deps.valid_refresh_token),
+    user: JWTData = Depends(parse_jwt_user_data),
 ):
     try:
         chat = Chat(db=db, user_id=user.user_id)
+        if streaming:
+            return StreamingResponse(
+                await chat.initialize_task_chat(db=db, request=request, stream=True),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
+            )
+
         return await chat.initialize_task_chat(db=db)
 
     except Exception as e:
@@ -30,7 +57,7 @@ async def create_chat(
         ) from e
 
 
-@router.post("/chat")
+@router.post("/chat", dependencies=[Depends(rate_limit_user)])
 async def add_message_to_chat(
     request: Request,
     is_image: bool = False,
@@ -38,10 +65,16 @@ async def add_message_to_chat(
     image_data: str = Body(None, embed=True),
     message: str = Body(..., embed=True),
     db: AsyncSession = Depends(get_db),
-    user: auth_models.RefreshToken = Depends(auth_deps.valid_refresh_token),
+    user: JWTData = Depends(parse_jwt_user_data),
+    chat_session: ChatSession = Depends(valid_chat_session),
 ):
     try:
-        chat = Chat(db=db, user_id=user.user_id)
+        chat = Chat(
+            db=db,
+            user_id=user.user_id,
+            session_id=chat_session.id,
+            system_prompt_version=chat_session.system_prompt_version,
+        )
 
         # TODO: need to discuss need to add image in the chat
         if is_image:
@@ -51,8 +84,12 @@ async def add_message_to_chat(
                 image_data=image_data,
             )
         if streaming:
-            return await chat.task_chat(
-                db=db, request=request, user_message=message, stream=streaming
+            return StreamingResponse(
+                await chat.task_chat(
+                    db=db, request=request, user_message=message, stream=streaming
+                ),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
             )
 
         # await chat.add_user_message(db=db, content=message, user_id=user.user_id)
@@ -66,10 +103,88 @@ async def add_message_to_chat(
         ) from e
 
 
-@router.get("/allChat")
+@router.get(
+    "/allChat", response_model=ChatMessagePage, dependencies=[Depends(rate_limit_user)]
+)
 async def get_all_chat(
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = Query(
+        chat_config.HISTORY_PAGE_SIZE, ge=1, le=chat_config.HISTORY_PAGE_MAX_SIZE
+    ),
+    stream: bool = False,
     db: AsyncSession = Depends(get_db),
-    user: auth_models.RefreshToken = Depends(auth_deps.valid_refresh_token),
+    user: JWTData = Depends(parse_jwt_user_data),
+    chat_session: ChatSession = Depends(valid_chat_session),
+):
+    chat = Chat(
+        db=db,
+        user_id=user.user_id,
+        session_id=chat_session.id,
+        system_prompt_version=chat_session.system_prompt_version,
+    )
+    before_key = decode_cursor(before) if before else None
+    after_key = decode_cursor(after) if after else None
+
+    if stream:
+        return StreamingResponse(
+            chat.stream_all_messages(before=before_key, after=after_key),
+            media_type="application/x-ndjson",
+        )
+
+    return await chat.get_all_messages(before=before_key, after=after_key, limit=limit)
+
+
+@router.get("/chat/images/{image_id}", name="get_chat_image")
+async def get_chat_image(
+    image_id: uuid.UUID,
+    thumbnail: bool = False,
+    range_header: str | None = Header(None, alias="Range"),
+    if_none_match: str | None = Header(None),
 ):
-    chat = Chat(db=db, user_id=user.user_id)
-    return await chat.get_all_messages()
+    # Stored files never change, so the file id is a strong validator and
+    # the unguessable id doubles as the access token for `<img>` links.
+    file_id = thumbnail_id(image_id) if thumbnail else image_id
+    etag = f'"{file_id}"'
+
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(
+                status_code=304,
+                headers={"ETag": etag, "Cache-Control": IMAGE_CACHE_CONTROL},
+            )
+
+    cache_control = IMAGE_CACHE_CONTROL
+    try:
+        stored_file = await get_stored_image(file_id)
+    except HTTPException as e:
+        if not thumbnail or e.status_code != 404:
+            raise
+        # Thumbnail not generated yet: send the original, revalidated on
+        # every load so the thumbnail replaces it once it exists.
+        stored_file = await get_stored_image(image_id)
+        etag, cache_control = f'"{image_id}"', "no-cache"
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    size = stored_file.object.size
+
+    byte_range = parse_range(range_header, size)
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    # The sync iterator is driven from the threadpool by `StreamingResponse`.
+    return StreamingResponse(
+        iter_stored_file(stored_file, start, end),
+        status_code=status_code,
+        media_type=stored_file.content_type,
+        headers=headers,
+    )
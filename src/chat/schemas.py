@@ -19,6 +19,13 @@ class ChatAlreadyExists(Exception):
 class ChatMessageOut(BaseORM):
     id: uuid.UUID
     role: str
-    content: str
+    message: str
     created_at: datetime.datetime
-    updated_at: datetime.datetime
+
+
+class ChatMessagePage(BaseModel):
+    messages: list[ChatMessageOut]
+    # pass as `before` for the previous page, None when there is none
+    before: str | None
+    # pass as `after` to fetch what was added after this page
+    after: str | None
@@ -1,40 +1,262 @@
+import io
 import re  # type: ignore
+import uuid  # type: ignore
+import base64
+import asyncio
+import hashlib
 import logging
-import requests
 
+from typing import Iterator  # type: ignore
+from datetime import datetime, timedelta  # type: ignore
+from collections import Counter  # type: ignore
+from tempfile import NamedTemporaryFile  # type: ignore
+
+import httpx
 from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy_file.file import File
+from sqlalchemy_file.helpers import LOCAL_STORAGE_DRIVER_NAME
+from sqlalchemy_file.storage import StorageManager
+from sqlalchemy_file.stored_file import StoredFile
+from libcloud.storage.types import ObjectDoesNotExistError
 
-from src.chat.models import ChatImage
+from src.db import Session
+from src.config import settings
+from src.clients import get_clients
+from src.chat.config import chat_config
+from src.chat.models import ChatImage, ChatSession, ImageBlob
+from src.chat.exceptions import InvalidCursor
+from src.chat.prompts import CURRENT_SYSTEM_PROMPT_VERSION
+from src.chat.thumbnails import inspect_image
 
 logger = logging.getLogger(__name__)
 
+# Downloads are kept in memory up to this size, then moved to a temp file.
+IMAGE_SPOOL_SIZE = 1024 * 1024  # 1MB
 
-async def save_image_from_url(db: AsyncSession, image_url: str):
+
+class ImageTooLarge(HTTPException):
+    def __init__(self, image_url: str):
+        max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        super().__init__(
+            status_code=413, detail=f"Image at {image_url} exceeds {max_size} bytes"
+        )
+
+
+async def download_image(image_url: str) -> tuple[str, File]:
+    """Stream `image_url` through the shared HTTP pool into memory or a temp file.
+
+    `MAX_IMAGE_UPLOAD_SIZE` is enforced while the body is transferred, so an
+    oversized image is rejected without being read in full. The content is
+    decoded in the thumbnail process pool to check it is an image, past
+    `IMAGE_SPOOL_SIZE` the pool reads it from the temp file rather than being
+    sent a copy. Returns the SHA-256 of the content along with the file.
+    """
+    max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+    client = get_clients().http_client
+    content = buffer = io.BytesIO()
+    digest = hashlib.sha256()
     try:
-        response = requests.get(image_url)
-        response.raise_for_status()
-    except requests.RequestException as e:
+        async with client.stream("GET", image_url) as response:
+            response.raise_for_status()
+            if int(response.headers.get("Content-Length", 0)) > max_size:
+                raise ImageTooLarge(image_url)
+
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > max_size:
+                    raise ImageTooLarge(image_url)
+                if content is buffer and size > IMAGE_SPOOL_SIZE:
+                    content = NamedTemporaryFile(prefix="chat-image-")
+                    content.write(buffer.getvalue())
+                content.write(chunk)
+                digest.update(chunk)
+
+        content.flush()
+        source = buffer.getvalue() if content is buffer else content.name
+        _, _, content_type = await inspect_image(source)
+    except httpx.HTTPError as e:
+        content.close()
         raise HTTPException(
             status_code=400, detail=f"Error fetching image from URL: {str(e)}"
         ) from e
+    except ValueError as e:
+        content.close()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except HTTPException:
+        content.close()
+        raise
+
+    if content is not buffer:
+        # `File` keeps the underlying file, not `content`, which deletes the
+        # temp file once collected. A handle of its own keeps the data until
+        # it is uploaded or closed, with the name already gone.
+        spooled = open(content.name, "rb")
+        content.close()
+        content = spooled
+
+    content.seek(0)
+    filename = image_url.split("?")[0].split("/")[-1]
+    file = File(content=content, filename=filename, content_type=content_type)
+    return digest.hexdigest(), file
+
+
+async def store_images(
+    db: AsyncSession, files: list[tuple[str, File]]
+) -> list[ChatImage]:
+    """Add a `ChatImage` for every `(sha256, file)`, uploading new content only.
+
+    Content that is already stored becomes a row pointing at the existing
+    `ImageBlob`; only unseen digests are uploaded. The rows are flushed, not
+    committed, new blobs still need `enqueue_thumbnail` once they are. The
+    content of files that are not uploaded is closed.
+    """
+    if not files:
+        return []
+
+    refs = Counter(digest for digest, _ in files)
+
+    # Serialize writers of the same digest until commit, so two requests
+    # storing the same image cannot both upload it. Locks are taken in
+    # sorted order to rule out deadlocks.
+    for digest in sorted(refs):
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(digest))))
+
+    result = await db.scalars(select(ImageBlob).where(ImageBlob.sha256.in_(list(refs))))
+    blobs = {blob.sha256: blob for blob in result}
+    for blob in blobs.values():
+        blob.ref_count = ImageBlob.ref_count + refs[blob.sha256]
+
+    for digest, file in files:
+        if digest not in blobs:
+            blobs[digest] = ImageBlob(sha256=digest, file=file, ref_count=refs[digest])
+            db.add(blobs[digest])
+        elif blobs[digest].file is not file and file.original_content is not None:
+            # frees a spooled download right away rather than when collected
+            file.original_content.close()
 
-    file_content = response.content
-    filename = image_url.split("/")[-1]
-    content_type = response.headers.get("Content-Type", "application/octet-stream")
+    chat_images = [ChatImage(blob=blobs[digest]) for digest, _ in files]
+    db.add_all(chat_images)
+    await db.flush()
 
-    file = File(content=file_content, filename=filename, content_type=content_type)
-    chat_image = ChatImage(file=file)
+    return chat_images
 
-    db.add(chat_image)
-    await db.commit()
-    await db.refresh(chat_image)
 
+async def save_image_from_url(db: AsyncSession, image_url: str):
+    (chat_image,) = await store_images(db, [await download_image(image_url)])
     return chat_image
 
 
+async def collect_image_blobs() -> int:
+    """Delete the `ImageBlob` rows, and their files, no `ChatImage` references.
+
+    Reference counts are first reconciled against `chat_images`, which
+    also accounts for image rows removed without going through
+    `store_images`. Blobs touched within `IMAGE_GC_GRACE` are left alone so
+    transactions still in flight are never raced.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=chat_config.IMAGE_GC_GRACE)
+    refs = (
+        select(func.count(ChatImage.id))
+        .where(ChatImage.blob_sha256 == ImageBlob.sha256)
+        .scalar_subquery()
+    )
+
+    async with Session() as db:
+        await db.execute(
+            update(ImageBlob)
+            .where((ImageBlob.updated_at < cutoff) & (ImageBlob.ref_count != refs))
+            # keeps `updated_at`, a blob reconciled to zero is collected below
+            .values(ref_count=refs, updated_at=ImageBlob.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+        stmt = (
+            select(ImageBlob)
+            .where((ImageBlob.ref_count <= 0) & (ImageBlob.updated_at < cutoff))
+            .limit(chat_config.IMAGE_GC_BATCH)
+            .with_for_update(skip_locked=True)
+        )
+        blobs = []
+        for blob in (await db.scalars(stmt)).all():
+            # `store_images` holds this lock from reading a blob until its
+            # reference is committed, such a blob is about to be used again.
+            locked = await db.scalar(
+                select(func.pg_try_advisory_xact_lock(func.hashtext(blob.sha256)))
+            )
+            if not locked:
+                continue
+
+            # deleting through the ORM lets `sqlalchemy_file` remove the
+            # original once the transaction commits
+            await db.delete(blob)
+            blobs.append(blob)
+
+        await db.commit()
+
+    for blob in blobs:
+        if blob.thumbnail is not None:
+            await delete_stored_file(blob.thumbnail["path"])
+
+    if blobs:
+        logger.info(f"Reclaimed {len(blobs)} unreferenced image blobs")
+    return len(blobs)
+
+
+async def run_image_gc():
+    """Run `collect_image_blobs` every `IMAGE_GC_INTERVAL` seconds."""
+    while True:
+        try:
+            await collect_image_blobs()
+        except Exception as e:
+            logger.error(f"Error collecting image blobs: {e}")
+        await asyncio.sleep(chat_config.IMAGE_GC_INTERVAL)
+
+
+async def create_chat_session(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    system_prompt_version: str = CURRENT_SYSTEM_PROMPT_VERSION,
+) -> ChatSession:
+    chat_session = ChatSession(
+        user_id=user_id, system_prompt_version=system_prompt_version
+    )
+
+    db.add(chat_session)
+    await db.flush()
+
+    return chat_session
+
+
+async def get_chat_session(
+    db: AsyncSession, session_id: uuid.UUID, user_id: uuid.UUID
+) -> ChatSession | None:
+    stmt = select(ChatSession).where(
+        (ChatSession.id == session_id) & (ChatSession.user_id == user_id)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+def encode_cursor(created_at: datetime, message_id: uuid.UUID) -> str:
+    """Opaque keyset cursor for the `(created_at, id)` of a message."""
+    return base64.urlsafe_b64encode(
+        f"{created_at.isoformat()}|{message_id}".encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(message_id)
+    except ValueError as e:
+        raise InvalidCursor() from e
+
+
 def contains_any_url(text, domain):
     try:
         # Regular expression to find URLs
@@ -57,39 +279,130 @@ async def find_image_urls(text):
         raise e
 
 
-async def url_mapper(request: Request, db: AsyncSession, image_url: str) -> dict:
-    try:
-        chat_image = await save_image_from_url(db, image_url)
-        chat_image_id = chat_image.file["thumbnail"]["file_id"]
-        new_image_url = str(request.url_for("get_chat_image", image_id=chat_image_id))
+async def map_all_urls(request: Request, db: AsyncSession, text: str):
+    """Store every generated image linked from `text` as a `ChatImage`.
 
-        return {"id": chat_image.id, "url_mapping": {image_url: new_image_url}}
-    except Exception as e:
-        logger.error(f"Error mapping URL: {e}")
-        raise e
+    All images are downloaded concurrently and stored through `store_images`,
+    so the caller can commit them with the message in one transaction. An
+    image that cannot be fetched keeps its original URL.
+    """
+    try:
+        image_urls = list(dict.fromkeys(await find_image_urls(text)))
+        downloads = await asyncio.gather(
+            *(download_image(url) for url in image_urls), return_exceptions=True
+        )
 
+        fetched = {}
+        for url, download in zip(image_urls, downloads):
+            if isinstance(download, Exception):
+                logger.error(f"Error saving image {url}: {download}")
+                continue
+            fetched[url] = download
 
-async def map_all_urls(request: Request, db: AsyncSession, text: str):
-    try:
-        image_urls = await find_image_urls(text)
-        url_mapping = {}
-        chat_image_ids = []
+        chat_images = await store_images(db, list(fetched.values()))
 
-        for url in image_urls:
-            result = await url_mapper(request, db, url)
-            url_mapping |= result["url_mapping"]
-            chat_image_ids.append(result["id"])
+        # Link the thumbnail, served as the original until it is generated.
+        url_mapping = {
+            url: str(
+                request.url_for(
+                    "get_chat_image", image_id=chat_image.blob.file["file_id"]
+                ).include_query_params(thumbnail="true")
+            )
+            for url, chat_image in zip(fetched, chat_images)
+        }
+        chat_image_ids = [chat_image.id for chat_image in chat_images]
+        pending_thumbnails = list(
+            {
+                chat_image.blob.sha256: None
+                for chat_image in chat_images
+                if chat_image.blob.thumbnail is None
+            }
+        )
 
         # Return both URL mappings and chat image IDs
-        return {"url_mapping": url_mapping, "chat_image_ids": chat_image_ids}
+        return {
+            "url_mapping": url_mapping,
+            "chat_image_ids": chat_image_ids,
+            "pending_thumbnails": pending_thumbnails,
+        }
     except Exception as e:
         logger.error(f"Error mapping all URLs: {e}")
         raise e
 
 
-async def update_chat_image_chat_id(db: AsyncSession, chat_image_id: int, chat_id: int):
-    chat_image = await db.get(ChatImage, chat_image_id)
-    chat_image.chat_id = chat_id
-    await db.commit()
-    await db.refresh(chat_image)
-    return chat_image
+async def link_chat_images(db: AsyncSession, chat_image_ids: list[int], chat_id):
+    """Point all `chat_image_ids` at the message `chat_id` in one statement."""
+    await db.execute(
+        update(ChatImage)
+        .where(ChatImage.id.in_(chat_image_ids))
+        .values(chat_id=chat_id)
+    )
+
+
+async def delete_stored_file(path: str):
+    try:
+        await run_in_threadpool(StorageManager.delete_file, path)
+    except ObjectDoesNotExistError:
+        pass
+
+
+async def get_stored_image(image_id: uuid.UUID) -> StoredFile:
+    """Look up an original or thumbnail file by its storage `file_id`."""
+    path = f"{StorageManager.get_default()}/{image_id}"
+    try:
+        return await run_in_threadpool(StorageManager.get_file, path)
+    except ObjectDoesNotExistError as e:
+        raise HTTPException(status_code=404, detail="Image not found") from e
+
+
+def parse_range(range_header: str | None, size: int) -> tuple[int, int] | None:
+    """Return the inclusive `(start, end)` of a single `bytes=` range.
+
+    `None` means the whole file should be sent: no header, a unit other than
+    bytes, or several ranges (which servers may answer with the full body).
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+
+    spec = range_header.removeprefix("bytes=").strip()
+    if "," in spec:
+        return None
+
+    start, sep, end = spec.partition("-")
+    try:
+        if not sep or not (start or end):
+            raise ValueError
+        if start:
+            first = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+        else:
+            # suffix range, the last `end` bytes
+            first = max(size - int(end), 0)
+            last = size - 1
+    except ValueError:
+        return None
+
+    if first > last or first >= size:
+        raise HTTPException(
+            status_code=416, headers={"Content-Range": f"bytes */{size}"}
+        )
+    return first, last
+
+
+def iter_stored_file(stored_file: StoredFile, start: int, end: int) -> Iterator[bytes]:
+    """Yield bytes `start` to `end` inclusive of `stored_file` in chunks."""
+    chunk_size = chat_config.IMAGE_STREAM_CHUNK_SIZE
+    obj = stored_file.object
+
+    # libcloud's local driver reads the whole file to serve a range, seek
+    # in the file ourselves instead.
+    if obj.driver.name == LOCAL_STORAGE_DRIVER_NAME:
+        with open(obj.get_cdn_url(), "rb") as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0 and (chunk := file.read(min(chunk_size, remaining))):
+                remaining -= len(chunk)
+                yield chunk
+        return
+
+    yield from obj.range_as_stream(start, end_bytes=end + 1, chunk_size=chunk_size)
@@ -0,0 +1,226 @@
+import io
+import time
+import uuid  # type: ignore
+import asyncio
+import logging
+import multiprocessing
+
+from typing import Any  # type: ignore
+from concurrent.futures import ProcessPoolExecutor  # type: ignore
+
+from sqlalchemy import select, update
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy_file.storage import StorageManager
+
+from src.db import Session
+from src.chat import imaging
+from src.chat.config import chat_config
+from src.chat.models import ImageBlob
+
+logger = logging.getLogger(__name__)
+
+# Thumbnails are stored under an id derived from the original's, so links to
+# `?thumbnail=true` can be handed out before the thumbnail exists.
+THUMBNAIL_NAMESPACE = uuid.UUID("6f1c3d1e-8a4b-4b1e-9a57-2f0c8e4d7b11")
+
+_executor: ProcessPoolExecutor | None = None
+_queue: asyncio.Queue[str] | None = None
+_tasks: set[asyncio.Task] = set()
+
+
+class ThumbnailStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "queued": _queue.qsize() if _queue is not None else 0,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_seconds": (
+                round(self.seconds / self.processed, 4) if self.processed else 0.0
+            ),
+            "workers": chat_config.THUMBNAIL_WORKERS,
+        }
+
+
+stats = ThumbnailStats()
+
+
+def thumbnail_id(file_id: uuid.UUID | str) -> uuid.UUID:
+    return uuid.uuid5(THUMBNAIL_NAMESPACE, str(file_id))
+
+
+def get_executor() -> ProcessPoolExecutor:
+    # `spawn` rather than `fork`, the parent runs threads (DB, threadpool)
+    # that must not be copied mid-operation into the workers.
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=chat_config.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def inspect_image(content: bytes | str) -> tuple[int, int, str]:
+    """Decode `content`, or the file at that path, in the process pool.
+
+    See `imaging.inspect_image`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), imaging.inspect_image, content)
+
+
+def enqueue_thumbnail(sha256: str):
+    """Queue a thumbnail for the blob `sha256`, without waiting for it."""
+    if _queue is None:
+        return
+    try:
+        _queue.put_nowait(sha256)
+    except asyncio.QueueFull:
+        # picked up again by the next sweep
+        stats.dropped += 1
+
+
+async def generate_thumbnail(sha256: str):
+    async with Session() as db:
+        blob = await db.get(ImageBlob, sha256)
+        if blob is None or blob.thumbnail is not None:
+            return
+
+        stored_file = await run_in_threadpool(
+            StorageManager.get_file, blob.file["path"]
+        )
+        content = await run_in_threadpool(stored_file.read)
+
+        loop = asyncio.get_running_loop()
+        thumbnail, width, height = await loop.run_in_executor(
+            get_executor(),
+            imaging.make_thumbnail,
+            content,
+            (chat_config.THUMBNAIL_SIZE, chat_config.THUMBNAIL_SIZE),
+        )
+
+        content_type = f"image/{imaging.THUMBNAIL_FORMAT}".lower()
+        filename = f"{blob.file['filename']}.thumbnail{width}x{height}.png"
+        upload_storage = blob.file["upload_storage"]
+        file_id = str(thumbnail_id(blob.file["file_id"]))
+        await run_in_threadpool(
+            StorageManager.save_file,
+            file_id,
+            io.BytesIO(thumbnail),
+            upload_storage=upload_storage,
+            extra={
+                "content_type": content_type,
+                "meta_data": {
+                    "filename": filename,
+                    "content_type": content_type,
+                    "width": width,
+                    "height": height,
+                },
+            },
+        )
+
+        blob.thumbnail = {
+            "file_id": file_id,
+            "width": width,
+            "height": height,
+            "upload_storage": upload_storage,
+            "path": f"{upload_storage}/{file_id}",
+        }
+        await db.commit()
+
+
+async def record_thumbnail_failure(sha256: str):
+    """Count a failed attempt, so images that always fail are not retried."""
+    async with Session() as db:
+        await db.execute(
+            update(ImageBlob)
+            .where(ImageBlob.sha256 == sha256)
+            .values(
+                thumbnail_attempts=ImageBlob.thumbnail_attempts + 1,
+                # not a use of the blob, the GC grace period is left alone
+                updated_at=ImageBlob.updated_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+
+async def enqueue_pending_thumbnails():
+    """Queue blobs still missing a thumbnail, e.g. after a restart or a drop.
+
+    Blobs that failed `THUMBNAIL_MAX_ATTEMPTS` times are skipped, and those
+    that failed before come last, so they cannot crowd out new ones.
+    """
+    async with Session() as db:
+        stmt = (
+            select(ImageBlob.sha256)
+            .where(
+                ImageBlob.thumbnail.is_(None)
+                & (ImageBlob.thumbnail_attempts < chat_config.THUMBNAIL_MAX_ATTEMPTS)
+            )
+            .order_by(ImageBlob.thumbnail_attempts, ImageBlob.created_at)
+            .limit(chat_config.THUMBNAIL_QUEUE_SIZE)
+        )
+        for sha256 in await db.scalars(stmt):
+            enqueue_thumbnail(sha256)
+
+
+async def _work():
+    while True:
+        sha256 = await _queue.get()
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await generate_thumbnail(sha256)
+            stats.processed += 1
+            stats.seconds += time.perf_counter() - start
+        except Exception as e:
+            stats.failed += 1
+            logger.error(f"Error generating thumbnail for {sha256}: {e}")
+            try:
+                await record_thumbnail_failure(sha256)
+            except Exception as e:
+                logger.error(f"Error recording thumbnail failure for {sha256}: {e}")
+        finally:
+            stats.in_flight -= 1
+            _queue.task_done()
+
+
+async def _sweep():
+    while True:
+        if _queue.empty():
+            try:
+                await enqueue_pending_thumbnails()
+            except Exception as e:
+                logger.error(f"Error sweeping pending thumbnails: {e}")
+        await asyncio.sleep(chat_config.THUMBNAIL_SWEEP_INTERVAL)
+
+
+def start_thumbnail_workers():
+    global _queue
+    _queue = asyncio.Queue(maxsize=chat_config.THUMBNAIL_QUEUE_SIZE)
+    get_executor()
+    for coro in [_sweep()] + [_work() for _ in range(chat_config.THUMBNAIL_WORKERS)]:
+        task = asyncio.create_task(coro)
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+
+async def stop_thumbnail_workers():
+    global _executor, _queue
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _queue = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
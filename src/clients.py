@@ -0,0 +1,124 @@
+import httpx
+import logging
+
+from exa_py import AsyncExa
+from openai import AsyncOpenAI
+from langchain_openai.chat_models import ChatOpenAI
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """Long-lived upstream clients shared by every request in the process.
+
+    Building an `AsyncOpenAI`, `ChatOpenAI` or `Exa` client per call opens a
+    fresh connection pool, so every call pays for a new TCP and TLS
+    handshake. The registry owns one keep-alive pool per upstream and hands
+    out clients bound to it.
+    """
+
+    def __init__(
+        self,
+        openai_api_key: str | None = settings.OPENAI_API_KEY,
+        exa_api_key: str | None = settings.EXA_API_KEY,
+        openai_base_url: str | None = None,
+    ):
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+        )
+
+        self.openai_api_key = openai_api_key
+        self.openai_base_url = openai_base_url
+        self.http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self.openai = AsyncOpenAI(
+            api_key=openai_api_key,
+            base_url=openai_base_url,
+            http_client=self.http_client,
+        )
+
+        self.exa_api_key = exa_api_key
+        self._exa: AsyncExa | None = None
+        self._limits = limits
+        self._timeout = timeout
+
+        self._chat_models: dict[tuple, ChatOpenAI] = {}
+
+    @property
+    def exa(self) -> AsyncExa:
+        # Created on first use, `AsyncExa` refuses to start without an API key.
+        if self._exa is None:
+            exa = AsyncExa(api_key=self.exa_api_key)
+            # AsyncExa builds its httpx client lazily with default limits, give
+            # it the tuned pool up front instead.
+            exa._client = httpx.AsyncClient(
+                base_url=exa.base_url,
+                headers=exa.headers,
+                limits=self._limits,
+                timeout=self._timeout,
+            )
+            self._exa = exa
+        return self._exa
+
+    def chat_model(
+        self,
+        model: str,
+        tools: list | None = None,
+        tool_choice: str | None = None,
+        **kwargs,
+    ):
+        """Return a shared `ChatOpenAI` for `model`, bound to `tools` if given."""
+        key = (
+            model,
+            tuple(tool.name for tool in tools or []),
+            tool_choice,
+            tuple(sorted(kwargs.items())),
+        )
+        if (chat_model := self._chat_models.get(key)) is None:
+            chat_model = ChatOpenAI(
+                openai_api_key=self.openai_api_key,
+                openai_api_base=self.openai_base_url,
+                model=model,
+                http_async_client=self.http_client,
+                **kwargs,
+            )
+            if tools:
+                chat_model = chat_model.bind_tools(tools, tool_choice=tool_choice)
+            self._chat_models[key] = chat_model
+
+        return chat_model
+
+    async def aclose(self):
+        await self.http_client.aclose()
+        if self._exa is not None:
+            await self._exa.client.aclose()
+
+
+registry: ClientRegistry | None = None
+
+
+def init_clients() -> ClientRegistry:
+    global registry
+    registry = ClientRegistry()
+    return registry
+
+
+def get_clients() -> ClientRegistry:
+    # Outside of the app lifespan (scripts, migrations) the registry is created
+    # on first use.
+    if registry is None:
+        return init_clients()
+    return registry
+
+
+async def close_clients():
+    global registry
+    if registry is not None:
+        await registry.aclose()
+        registry = None
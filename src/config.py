@@ -42,6 +42,8 @@ class Config(BaseSettings):
     CORS_HEADERS: list[str] = ["*"]
     PROJECT_ROOT: Path = Path(__file__).parent.parent.parent
     CORS_ORIGINS_REGEX: str | None = None
+    # Addresses or networks whose X-Forwarded-For header is believed.
+    TRUSTED_PROXIES: list[str] = []
 
     ENVIRONMENT: Environment = Environment.DEV
     DEBUG: bool = False
@@ -87,8 +89,20 @@ class Config(BaseSettings):
     LANGCHAIN_PROJECT: str | None = None
 
     SERPER_API_KEY: str | None = None
+    EXA_API_KEY: str | None = os.environ.get("EXA_API_KEY")
+
+    # upstream HTTP pools, shared through `src.clients`
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP_TIMEOUT: float = 60.0  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 5.0  # seconds
     MAX_IMAGE_UPLOAD_SIZE: int = 1024 * 1024 * 10  # 10MB
 
+    # file storage for `sqlalchemy_file` fields, see `src.storage`
+    STORAGE_DIR: Path = Path("uploads")
+    STORAGE_CONTAINER: str = "chat_images"
+
 
 settings = Config()
 
@@ -1,3 +1,4 @@
+import asyncio
 import sentry_sdk  # type: ignore
 import redis.asyncio as aioredis
 
@@ -7,9 +8,18 @@ from contextlib import asynccontextmanager  # type: ignore
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
-# from src import redis
+from src import redis
+from src.cache import caches
+from src.rate_limit import rate_limiters
 from src.logger import logger
+from src.clients import close_clients, init_clients
 from src.config import app_configs, settings
+from src.storage import init_storage
+from src.chat.prompts import get_system_prompt
+from src.chat.greetings import run_greeting_refresh
+from src.chat.services import run_image_gc
+from src.chat import thumbnails
+from src.auth import security
 from src.auth.router import router as auth_router
 from src.chat.router import router as chat_router
 
@@ -28,8 +38,6 @@ except Exception as e:
     logger.error(f"Error setting redis url: {e}")
     REDIS_URL = "redis://localhost:6379/0"
 
-redis = aioredis.from_url(REDIS_URL)
-
 
 @asynccontextmanager
 async def lifespan(_application: FastAPI) -> AsyncGenerator:
@@ -38,12 +46,26 @@ async def lifespan(_application: FastAPI) -> AsyncGenerator:
         str(REDIS_URL), max_connections=10, decode_responses=True
     )
     redis.redis_client = aioredis.Redis(connection_pool=pool)
+    init_clients()
+    init_storage()
+    image_gc = greeting_refresh = None
+    if not settings.ENVIRONMENT.is_testing:
+        image_gc = asyncio.create_task(run_image_gc())
+        greeting_refresh = asyncio.create_task(
+            run_greeting_refresh(get_system_prompt())
+        )
+        thumbnails.start_thumbnail_workers()
 
     yield
 
     if settings.ENVIRONMENT.is_testing:
         return
     # Shutdown
+    image_gc.cancel()
+    greeting_refresh.cancel()
+    await thumbnails.stop_thumbnail_workers()
+    security.shutdown_executor()
+    await close_clients()
     await pool.disconnect()
 
 
@@ -87,5 +109,25 @@ async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics/cache", include_in_schema=False)
+async def cache_metrics() -> dict[str, dict]:
+    return {namespace: cache.stats() for namespace, cache in caches.items()}
+
+
+@app.get("/metrics/rate_limits", include_in_schema=False)
+async def rate_limit_metrics() -> dict[str, dict]:
+    return {name: limiter.stats() for name, limiter in rate_limiters.items()}
+
+
+@app.get("/metrics/thumbnails", include_in_schema=False)
+async def thumbnail_metrics() -> dict:
+    return thumbnails.stats.as_dict()
+
+
+@app.get("/metrics/password_hashing", include_in_schema=False)
+async def password_hashing_metrics() -> dict:
+    return security.stats.as_dict()
+
+
 app.include_router(auth_router, tags=["auth"])
 app.include_router(chat_router, tags=["chat"])
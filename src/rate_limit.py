@@ -0,0 +1,164 @@
+import math
+import time
+import logging
+import ipaddress
+
+from typing import Any  # type: ignore
+
+from fastapi import Request
+from redis.exceptions import RedisError
+
+from src import redis
+from src.cache import LRUCache
+from src.config import settings
+from src.exceptions import TooManyRequests
+
+logger = logging.getLogger(__name__)
+
+# Every `RateLimiter` registers itself here so its counters can be exposed.
+rate_limiters: dict[str, "RateLimiter"] = {}
+
+# Refills the bucket for the time elapsed since its last update, then takes
+# one token if there is one. Returns 0 when allowed, else the seconds until a
+# token is available, as a string since Lua numbers are truncated in replies.
+# The clock is Redis' own, so workers with skewed clocks share one timeline.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / refill
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000))
+return tostring(retry_after)
+"""
+
+_trusted_proxies = [
+    ipaddress.ip_network(proxy, strict=False) for proxy in settings.TRUSTED_PROXIES
+]
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_proxies)
+
+
+def client_address(request: Request) -> str:
+    """The address of the client, behind `TRUSTED_PROXIES` if there are any.
+
+    `X-Forwarded-For` is walked back from the nearest hop while the hop that
+    reported it is a trusted proxy. Anyone else could put anything there, so
+    from an untrusted peer the header is ignored.
+    """
+    address = request.client.host if request.client else "unknown"
+    hops = request.headers.get("X-Forwarded-For", "").split(",")
+    for hop in reversed([hop.strip() for hop in hops if hop.strip()]):
+        if not _is_trusted_proxy(address):
+            break
+        address = hop
+    return address
+
+
+def take_token(
+    bucket: tuple[float, float] | None, now: float, capacity: int, refill: float
+) -> tuple[tuple[float, float], float]:
+    """In-process twin of `TOKEN_BUCKET_SCRIPT`: new bucket and retry-after."""
+    tokens, updated = bucket if bucket is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) / refill
+
+
+class RateLimiter:
+    """Token buckets of `capacity` requests refilled at `refill` per second.
+
+    Buckets live under `rate_limit:<namespace>:` in Redis and are checked and
+    updated by a single Lua script, so a request costs one round trip. Without
+    a Redis client, or when a Redis call fails, buckets are kept in process
+    instead, which limits each worker on its own rather than not at all.
+    """
+
+    def __init__(
+        self, namespace: str, capacity: int, refill: float, max_local_buckets: int
+    ):
+        self.namespace = namespace
+        self.capacity = capacity
+        self.refill = refill
+        # An idle bucket is full again after capacity / refill seconds.
+        self.local = LRUCache(max_entries=max_local_buckets, ttl=capacity / refill)
+        self._script = None
+
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+
+        rate_limiters[namespace] = self
+
+    def _key(self, key: str) -> str:
+        return f"rate_limit:{self.namespace}:{key}"
+
+    async def _redis_hit(self, client, key: str) -> float:
+        if self._script is None or self._script.registered_client is not client:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        retry_after = await self._script(
+            keys=[self._key(key)], args=[self.capacity, self.refill]
+        )
+        return float(retry_after)
+
+    def _local_hit(self, key: str) -> float:
+        bucket, retry_after = take_token(
+            self.local.get(key), time.monotonic(), self.capacity, self.refill
+        )
+        self.local.set(key, bucket)
+        return retry_after
+
+    async def hit(self, key: str) -> float:
+        """Take a token from the bucket `key`, 0 or the seconds to wait."""
+        retry_after = None
+        if (client := redis.redis_client) is not None:
+            try:
+                retry_after = await self._redis_hit(client, key)
+            except RedisError as e:
+                self.errors += 1
+                logger.warning(f"Error checking {self.namespace} rate limit: {e}")
+        if retry_after is None:
+            retry_after = self._local_hit(key)
+
+        if retry_after:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    async def check(self, request: Request, identity: str):
+        """Raise `TooManyRequests` once `identity` exhausts this route's bucket."""
+        route = request.scope.get("route")
+        path = route.path if route is not None else request.url.path
+        if retry_after := await self.hit(f"{request.method}:{path}:{identity}"):
+            raise TooManyRequests(headers={"Retry-After": str(math.ceil(retry_after))})
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "capacity": self.capacity,
+            "refill_per_second": self.refill,
+            "local_buckets": len(self.local),
+        }
@@ -0,0 +1,5 @@
+import redis.asyncio as aioredis
+
+# Shared client, bound to the connection pool created in `src.main.lifespan`.
+# It stays `None` until startup so callers must fall back when Redis is absent.
+redis_client: aioredis.Redis | None = None
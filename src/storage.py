@@ -0,0 +1,23 @@
+import logging
+
+from libcloud.storage.drivers.local import LocalStorageDriver
+from sqlalchemy_file.storage import StorageManager
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def init_storage():
+    """Register the local container used by `sqlalchemy_file` fields as default."""
+    if settings.STORAGE_CONTAINER in StorageManager._storages:
+        return
+
+    (settings.STORAGE_DIR / settings.STORAGE_CONTAINER).mkdir(
+        parents=True, exist_ok=True
+    )
+    driver = LocalStorageDriver(str(settings.STORAGE_DIR))
+    StorageManager.add_storage(
+        settings.STORAGE_CONTAINER, driver.get_container(settings.STORAGE_CONTAINER)
+    )
+    logger.info(f"Using file storage at {settings.STORAGE_DIR}")
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import random  # type: ignore
 import string  # type: ignore
 import logging
@@ -6,12 +7,13 @@ import tiktoken
 import requests
 
 from enum import Enum  # type: ignore
-from openai import AsyncOpenAI
-from exa_py import Exa
 from urllib.parse import urlparse  # type: ignore
 from pdfplumber import open as open_pdf
 from dotenv import load_dotenv, find_dotenv
 
+from src.clients import get_clients
+from src.chat.research import research
+
 load_dotenv(find_dotenv())
 
 logger = logging.getLogger(__name__)
@@ -87,14 +89,7 @@ def download_pdf(url, filename):
 
 
 async def generate_content(messages: list, model: str = GPT4) -> dict:
-    # Fetch OpenAI API key from environment variables
-    api_key = os.environ.get("OPENAI_API_KEY")
-
-    if not api_key:
-        raise ValueError("OpenAI API key is not provided")
-
-    # Initialize OpenAI client
-    client = AsyncOpenAI(api_key=api_key)
+    client = get_clients().openai
     if model == GPT4 and "json" in messages[0]["content"].lower():
         res = await client.chat.completions.create(
             model=model,
@@ -113,16 +108,10 @@ async def generate_content(messages: list, model: str = GPT4) -> dict:
     return res.choices[0].message.content
 
 
-def get_generated_image(prompt, number_of_images):
-    api_key = os.environ.get("OPENAI_API_KEY")
-
-    if not api_key:
-        raise ValueError("OpenAI API key is not provided")
-
-    # Initialize OpenAI client
-    client = AsyncOpenAI(api_key=api_key)
+async def get_generated_image(prompt, number_of_images):
+    client = get_clients().openai
     if number_of_images > 1:
-        image_response = client.images.generate(
+        image_response = await client.images.generate(
             model="dall-e-2",
             prompt=f"Create an image of {prompt}",
             size="512x512",
@@ -131,7 +120,7 @@ def get_generated_image(prompt, number_of_images):
         )
         return " ".join([i.url for i in image_response.data])
 
-    image_response = client.images.generate(
+    image_response = await client.images.generate(
         model="dall-e-3",
         prompt=f"Create an image of {prompt}",
         size="1024x1024",
@@ -143,11 +132,9 @@ def get_generated_image(prompt, number_of_images):
 
 async def exa_search(query):
     try:
-        searched_content = []
-        exa = Exa(api_key=os.environ.get("EXA_API_KEY"))
-        exa_response = exa.search_and_contents(query, num_results=2)
-        for text in exa_response.results:
-            searched_content.append(await restrict_tokens(text.text, 2000))
+        searched_content = await research(
+            query, lambda text, _: restrict_tokens(text, 2000), num_results=2
+        )
         return "\n".join(searched_content)
     except Exception as e:
         logger.error(f"Error in exa search: {e}")
@@ -156,12 +143,9 @@ async def exa_search(query):
 
 async def internet_search(outline):
     try:
-        # Internet search
-        all_search_data = []
-        for data in outline:
-            topics_data = await exa_search(data)
-            all_search_data.append(topics_data)
-        return "\n".join(all_search_data)
+        # Internet search, all outline topics at once
+        all_search_data = await asyncio.gather(*(exa_search(data) for data in outline))
+        return "\n".join(data for data in all_search_data if data)
     except Exception as e:
         logger.error(f"Error in internet search: {e}")
 
@@ -194,7 +178,7 @@ async def summarize_text(text, outline):
             }
         ]
 
-        client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        client = get_clients().openai
 
         res = await client.chat.completions.create(
             model=GPT3,
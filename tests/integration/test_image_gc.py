@@ -0,0 +1,57 @@
+import socket
+import asyncio
+import hashlib
+from datetime import datetime, timedelta  # type: ignore
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy_file.file import File
+
+from src.db import Session, engine
+from src.config import settings
+from src.storage import init_storage
+from src.chat import services
+from src.chat.config import chat_config
+from src.chat.models import ImageBlob
+
+
+async def collect_stale_orphan(content: bytes) -> tuple[int, ImageBlob | None]:
+    digest = hashlib.sha256(content).hexdigest()
+    stale = datetime.utcnow() - timedelta(seconds=chat_config.IMAGE_GC_GRACE * 2)
+    try:
+        # Counted as referenced, but no `ChatImage` points at it.
+        async with Session() as db:
+            db.add(ImageBlob(sha256=digest, file=File(content=content), ref_count=1))
+            await db.commit()
+            await db.execute(
+                update(ImageBlob)
+                .where(ImageBlob.sha256 == digest)
+                .values(updated_at=stale)
+            )
+            await db.commit()
+
+        collected = await services.collect_image_blobs()
+
+        async with Session() as db:
+            return collected, await db.get(ImageBlob, digest)
+    finally:
+        await engine.dispose()
+
+
+def test_blob_reconciled_to_zero_is_collected_in_the_same_pass(monkeypatch, tmp_path):
+    # Needs the configured database, migrated to head.
+    try:
+        socket.create_connection(
+            (settings.DB_HOST, settings.DB_PORT), timeout=1
+        ).close()
+    except OSError as e:
+        pytest.skip(f"database unavailable: {e}")
+
+    monkeypatch.setattr(settings, "STORAGE_DIR", tmp_path)
+    init_storage()
+    content = f"orphan {datetime.utcnow().isoformat()}".encode()
+
+    collected, blob = asyncio.run(collect_stale_orphan(content))
+
+    assert collected >= 1
+    assert blob is None
@@ -0,0 +1,61 @@
+import uuid
+import socket
+import asyncio
+
+import pytest
+from sqlalchemy import delete, select
+
+from src.db import Session, engine
+from src.config import settings
+from src.auth import service
+from src.auth.models import User
+from src.auth.schemas import AuthUser
+from src.auth.exceptions import EmailTaken
+
+SIGNUPS = 25
+
+
+async def fast_hash(password: str) -> str:
+    return f"hashed-{password}"
+
+
+async def signup(email: str):
+    async with Session() as db:
+        return await service.create_user(
+            db, AuthUser(email=email, password="Secret123!")
+        )
+
+
+async def parallel_signups(email: str):
+    try:
+        results = await asyncio.gather(
+            *(signup(email) for _ in range(SIGNUPS)), return_exceptions=True
+        )
+        async with Session() as db:
+            users = (await db.scalars(select(User).where(User.email == email))).all()
+            await db.execute(delete(User).where(User.email == email))
+            await db.commit()
+        return results, users
+    finally:
+        await engine.dispose()
+
+
+def test_parallel_signups_create_exactly_one_user(monkeypatch):
+    # Needs the configured database, migrated to head.
+    try:
+        socket.create_connection(
+            (settings.DB_HOST, settings.DB_PORT), timeout=1
+        ).close()
+    except OSError as e:
+        pytest.skip(f"database unavailable: {e}")
+
+    monkeypatch.setattr(service, "hash_password", fast_hash)
+    email = f"signup-{uuid.uuid4()}@example.com"
+    results, users = asyncio.run(parallel_signups(email))
+
+    created = [result for result in results if isinstance(result, User)]
+    assert len(created) == 1
+    assert all(
+        isinstance(result, EmailTaken) for result in results if result not in created
+    )
+    assert [user.id for user in users] == [created[0].id]
@@ -0,0 +1,29 @@
+import pytest
+import tiktoken
+
+from src.chat import context
+
+
+class CharacterEncoding:
+    """One token per character, standing in for the tiktoken encodings."""
+
+    def encode(self, text: str, **kwargs) -> list[int]:
+        return [ord(character) for character in text]
+
+    def encode_batch(self, texts: list[str], **kwargs) -> list[list[int]]:
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens: list[int]) -> str:
+        return "".join(map(chr, tokens))
+
+
+@pytest.fixture(autouse=True)
+def offline_encoding(monkeypatch):
+    # Keeps the tests offline, tiktoken downloads its encodings on first use.
+    monkeypatch.setattr(
+        tiktoken, "encoding_for_model", lambda model: CharacterEncoding()
+    )
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: CharacterEncoding())
+    context.get_encoding.cache_clear()
+    yield
+    context.get_encoding.cache_clear()
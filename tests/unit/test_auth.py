@@ -0,0 +1,160 @@
+import time
+import uuid
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.auth import security, service
+from src.auth.config import auth_config
+from src.auth.schemas import AuthUser
+from src.auth.exceptions import EmailTaken, PasswordHashingBusy
+
+
+class FakeSession:
+    """Answers every lookup with the same row and counts the queries."""
+
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query)
+        return SimpleNamespace(
+            one_or_none=lambda: self.row, scalar_one_or_none=lambda: self.row
+        )
+
+    async def commit(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def token_row():
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        expires_at=datetime.datetime.utcnow() + datetime.timedelta(days=1),
+    )
+
+
+def test_refresh_token_is_stored_and_looked_up_by_hash():
+    token = "a" * 64
+
+    assert service.hash_refresh_token(token) != token
+    assert len(service.hash_refresh_token(token)) == 64
+    assert service.hash_refresh_token(token) == service.hash_refresh_token(token)
+
+
+def test_validated_refresh_token_is_served_from_cache(monkeypatch):
+    row = token_row()
+    db = FakeSession(row)
+    monkeypatch.setattr(service, "Session", lambda: db)
+
+    async def lookups():
+        return [await service.get_refresh_token("cached-token") for _ in range(3)]
+
+    tokens = asyncio.run(lookups())
+
+    assert len(db.queries) == 1
+    assert {token.user_id for token in tokens} == {row.user_id}
+
+
+def test_expired_refresh_token_is_evicted_from_cache(monkeypatch):
+    db = FakeSession(token_row())
+    monkeypatch.setattr(service, "Session", lambda: db)
+
+    async def logout_and_lookup():
+        await service.get_refresh_token("logout-token")
+        await service.expire_refresh_token(db, "logout-token")
+        db.row = None
+        return await service.get_refresh_token("logout-token")
+
+    assert asyncio.run(logout_and_lookup()) is None
+    # lookup, expiry update, and a fresh lookup after the eviction
+    assert len(db.queries) == 3
+
+
+def test_signup_is_one_upsert_and_a_conflict_is_email_taken(monkeypatch):
+    async def fast_hash(password):
+        return password
+
+    monkeypatch.setattr(service, "hash_password", fast_hash)
+    db = FakeSession(None)
+    user = AuthUser(email="taken@example.com", password="Secret123!")
+
+    with pytest.raises(EmailTaken):
+        asyncio.run(service.create_user(db, user))
+
+    sql = str(db.queries[0].compile(dialect=postgresql.dialect()))
+    assert len(db.queries) == 1
+    assert "ON CONFLICT (email) DO NOTHING RETURNING" in sql
+
+
+def test_bcrypt_hashes_round_trip_past_72_bytes():
+    password = "Secret123!" * 10
+    hashed = asyncio.run(security.hash_password(password))
+
+    assert hashed.startswith("$2b$")
+    assert asyncio.run(security.check_password(password, hashed))
+    assert not asyncio.run(security.check_password("Secret123?", hashed))
+
+
+@pytest.fixture
+def slow_hashing(monkeypatch):
+    # Stands in for bcrypt, which also sleeps outside the GIL.
+    def verify(password, password_in_db):
+        time.sleep(0.2)
+        return password == password_in_db
+
+    monkeypatch.setattr(security, "bcrypt_check", verify)
+    monkeypatch.setattr(auth_config, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(auth_config, "PASSWORD_HASH_QUEUE_SIZE", 1)
+    security.shutdown_executor()
+    yield
+    security.shutdown_executor()
+
+
+def test_password_checks_do_not_block_the_event_loop(slow_hashing):
+    async def check_while_ticking():
+        lags = []
+
+        async def tick():
+            for _ in range(20):
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - start)
+
+        results = await asyncio.gather(
+            security.check_password("secret", "secret"),
+            security.check_password("secret", "other"),
+            tick(),
+        )
+        return results[:2], max(lags)
+
+    results, max_lag = asyncio.run(check_while_ticking())
+
+    assert results == [True, False]
+    assert max_lag < 0.1
+
+
+def test_saturated_password_pool_rejects_at_once(slow_hashing):
+    async def burst():
+        return await asyncio.gather(
+            *(security.check_password("secret", "secret") for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(burst())
+
+    assert results[:2] == [True, True]
+    assert isinstance(results[2], PasswordHashingBusy)
+    assert time.perf_counter() - start < 1
+    assert security.stats.in_flight == 0
@@ -0,0 +1,96 @@
+import uuid
+import asyncio
+import datetime
+
+import pytest
+
+from src import redis
+from src.chat.cache import ConversationCache
+from src.cache import Cache, LRUCache, compress, decompress
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1, ttl=-1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_counts_hits_and_misses_without_redis():
+    cache = Cache("test", ttl=60, max_entries=10)
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        return {"value": 1}
+
+    async def lookups():
+        return [await cache.get_or_set("key", factory) for _ in range(3)]
+
+    assert asyncio.run(lookups()) == [{"value": 1}] * 3
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_collapses_concurrent_misses():
+    cache = Cache("test-collapse", ttl=60, max_entries=10)
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def burst():
+        return await asyncio.gather(
+            *(cache.get_or_set("key", factory) for _ in range(10))
+        )
+
+    assert asyncio.run(burst()) == ["value"] * 10
+    assert len(calls) == 1
+    assert cache.stats()["collapsed"] == 9
+
+
+def test_compress_round_trip():
+    text = "market size " * 100
+
+    assert decompress(compress(text)) == text
+    assert len(compress(text)) < len(text)
+
+
+def test_history_fill_does_not_overwrite_a_newer_append(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(
+        redis, "redis_client", fakeredis.FakeAsyncRedis(decode_responses=True)
+    )
+    cache = ConversationCache(ttl=60, max_messages=10)
+    session_id = uuid.uuid4()
+    first = ("user", "hello", datetime.datetime(2026, 1, 1))
+    second = ("assistant", "hi", datetime.datetime(2026, 1, 1, 0, 1))
+
+    async def interleaved():
+        # Warm, as another request's fill left it.
+        await cache.fill(session_id, [first], await cache.version(session_id))
+        # This request missed the cache and read Postgres before `second`
+        # was committed and appended.
+        version = await cache.version(session_id)
+        snapshot = [first]
+        await cache.append(session_id, *second)
+        await cache.fill(session_id, snapshot, version)
+        return await cache.load(session_id)
+
+    assert asyncio.run(interleaved()) == [first, second]
@@ -0,0 +1,35 @@
+from src.chat import compaction
+
+OUTPUT = (
+    "Acme was founded in 1999 in Ohio. "
+    "The CRM market is worth 70 billion dollars and grows 12 percent a year. "
+    "Its office has a nice view of the river. "
+    "Growth of the CRM market is driven by small businesses moving to the cloud.\n"
+    "The team enjoys a yearly picnic."
+)
+
+
+def test_bm25_ranks_sentences_with_rare_query_terms_first():
+    sentences = [
+        compaction.tokenize(sentence) for sentence in compaction.split_sentences(OUTPUT)
+    ]
+
+    scores = compaction.bm25_scores(sentences, compaction.tokenize("CRM market growth"))
+
+    assert scores.argmax() in (1, 3)
+    assert scores[0] == scores[2] == scores[4] == 0
+
+
+def test_compact_keeps_relevant_sentences_in_order_within_budget():
+    compacted = compaction.compact(OUTPUT, "How fast is the CRM market growing?", 160)
+
+    assert compacted.splitlines() == [
+        "The CRM market is worth 70 billion dollars and grows 12 percent a year.",
+        "Growth of the CRM market is driven by small businesses moving to the cloud.",
+    ]
+
+
+def test_compact_leaves_short_output_alone():
+    url = "https://example.com/image.png"
+
+    assert compaction.compact(url, "a picture of a cat", 30) == url
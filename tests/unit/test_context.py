@@ -0,0 +1,49 @@
+import datetime
+
+from src.chat import context
+from src.chat.models import ChatSummary
+from src.chat.prompts import get_system_prompt
+
+LOAD_LIMIT = 200
+
+
+def turns(count: int) -> list[tuple[str, str, datetime.datetime]]:
+    start = datetime.datetime(2026, 1, 1)
+    return [
+        (
+            "user" if turn % 2 else "assistant",
+            "ok",
+            start + datetime.timedelta(seconds=turn),
+        )
+        for turn in range(count)
+    ]
+
+
+def test_turns_left_out_of_a_truncated_load_are_summarized():
+    entries = turns(250)[-LOAD_LIMIT:]
+
+    messages, cutoff = context.build_context_window(
+        entries, system_prompt=get_system_prompt(), budget=100_000, truncated=True
+    )
+
+    assert len(messages) == LOAD_LIMIT + 1
+    assert cutoff == entries[0][2]
+
+
+def test_complete_or_summarized_loads_need_no_summary():
+    entries = turns(LOAD_LIMIT)
+    summary = ChatSummary(summary="earlier turns", summarized_until=entries[0][2])
+
+    _, complete = context.build_context_window(
+        entries, system_prompt=get_system_prompt(), budget=100_000
+    )
+    _, summarized = context.build_context_window(
+        entries,
+        system_prompt=get_system_prompt(),
+        summary=summary,
+        budget=100_000,
+        truncated=True,
+    )
+
+    assert complete is None
+    assert summarized is None
@@ -0,0 +1,29 @@
+import asyncio
+
+from src.chat import greetings
+
+
+def test_greeting_pool_is_filled_on_miss_and_served_after(monkeypatch):
+    calls = []
+
+    async def generate_greetings(system_prompt):
+        calls.append(system_prompt)
+        return ["Hello!", "Hi there!"]
+
+    monkeypatch.setattr(greetings, "generate_greetings", generate_greetings)
+
+    async def start_chats():
+        first = await greetings.get_greeting("test prompt v1")
+        await asyncio.gather(*greetings._refresh_tasks.values())
+        return first, [await greetings.get_greeting("test prompt v1") for _ in range(3)]
+
+    first, pooled = asyncio.run(start_chats())
+
+    assert first is None
+    assert calls == ["test prompt v1"]
+    assert set(pooled) <= {"Hello!", "Hi there!"}
+
+
+def test_greeting_pools_are_kept_per_prompt_version():
+    assert greetings.prompt_version("prompt a") != greetings.prompt_version("prompt b")
+    assert greetings.prompt_version("prompt a") == greetings.prompt_version("prompt a")
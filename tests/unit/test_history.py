@@ -0,0 +1,19 @@
+import uuid
+import datetime
+
+import pytest
+
+from src.chat.exceptions import InvalidCursor
+from src.chat.services import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    key = (datetime.datetime(2026, 1, 1, 12, 30, 0, 123456), uuid.uuid4())
+
+    assert decode_cursor(encode_cursor(*key)) == key
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "MjAyNi0wMS0wMQ=="])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
@@ -0,0 +1,185 @@
+import io
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from sqlalchemy.dialects import postgresql
+from sqlalchemy_file.file import File
+
+from src.chat import services, thumbnails
+from src.chat.models import ImageBlob
+from src.chat.services import parse_range
+from src.chat.imaging import inspect_image, make_thumbnail
+
+
+def png(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(output, "PNG")
+    return output.getvalue()
+
+
+IMAGE = png(64, 32)
+
+
+def mock_clients(monkeypatch, max_size=None, content=IMAGE):
+    def handler(request):
+        return httpx.Response(
+            200, content=content, headers={"Content-Type": "image/png"}
+        )
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(
+        services, "get_clients", lambda: SimpleNamespace(http_client=http_client)
+    )
+    if max_size is not None:
+        monkeypatch.setattr(services.settings, "MAX_IMAGE_UPLOAD_SIZE", max_size)
+
+
+def test_parse_range_without_header_sends_whole_file():
+    assert parse_range(None, 1000) is None
+    assert parse_range("items=0-10", 1000) is None
+    assert parse_range("bytes=0-1,5-6", 1000) is None
+
+
+def test_parse_range_clamps_to_file_size():
+    assert parse_range("bytes=10-19", 1000) == (10, 19)
+    assert parse_range("bytes=990-", 1000) == (990, 999)
+    assert parse_range("bytes=990-5000", 1000) == (990, 999)
+    assert parse_range("bytes=-5", 1000) == (995, 999)
+
+
+def test_parse_range_rejects_unsatisfiable_range():
+    with pytest.raises(HTTPException) as exc_info:
+        parse_range("bytes=1000-", 1000)
+
+    assert exc_info.value.status_code == 416
+    assert exc_info.value.headers == {"Content-Range": "bytes */1000"}
+
+
+def test_download_image_hashes_content(monkeypatch):
+    mock_clients(monkeypatch)
+
+    digest, file = asyncio.run(services.download_image("https://x/a.png?sig=1"))
+
+    assert digest == hashlib.sha256(IMAGE).hexdigest()
+    assert file["filename"] == "a.png"
+    assert file["content_type"] == "image/png"
+
+
+def test_large_download_is_inspected_from_its_temp_file(monkeypatch):
+    mock_clients(monkeypatch)
+    monkeypatch.setattr(services, "IMAGE_SPOOL_SIZE", 16)
+    sources = []
+
+    async def inspect(source):
+        sources.append(source)
+        return inspect_image(source)
+
+    monkeypatch.setattr(services, "inspect_image", inspect)
+
+    digest, file = asyncio.run(services.download_image("https://x/a.png"))
+
+    assert isinstance(sources[0], str)
+    assert digest == hashlib.sha256(IMAGE).hexdigest()
+    assert file["content_type"] == "image/png"
+    # still readable for the upload once the download has returned
+    assert file.original_content.read() == IMAGE
+
+
+def test_download_image_rejects_oversized_body(monkeypatch):
+    mock_clients(monkeypatch, max_size=16)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(services.download_image("https://x/a.png"))
+
+    assert exc_info.value.status_code == 413
+
+
+def test_download_image_rejects_non_images(monkeypatch):
+    mock_clients(monkeypatch, content=b"<html></html>")
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(services.download_image("https://x/a.png"))
+
+    assert exc_info.value.status_code == 400
+
+
+def test_inspect_image_reads_dimensions():
+    assert inspect_image(IMAGE) == (64, 32, "image/png")
+
+    with pytest.raises(ValueError):
+        inspect_image(b"not an image")
+
+
+def test_make_thumbnail_keeps_aspect_ratio():
+    thumbnail, width, height = make_thumbnail(png(1024, 512), (512, 512))
+
+    assert (width, height) == (512, 256)
+    assert Image.open(io.BytesIO(thumbnail)).size == (512, 256)
+
+
+def test_make_thumbnail_converts_modes_png_cannot_hold():
+    source = io.BytesIO()
+    Image.new("CMYK", (64, 32)).save(source, "JPEG")
+
+    thumbnail, width, height = make_thumbnail(source.getvalue(), (16, 16))
+
+    assert (width, height) == (16, 8)
+    assert Image.open(io.BytesIO(thumbnail)).mode == "RGB"
+
+
+class FakeSession:
+    """Stores nothing, `existing` are the blobs already in the database."""
+
+    def __init__(self, existing=()):
+        self.existing = list(existing)
+        self.added = []
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def scalars(self, statement):
+        self.statements.append(statement)
+        return self.existing
+
+    def add(self, instance):
+        self.added.append(instance)
+
+    def add_all(self, instances):
+        self.added.extend(instances)
+
+    async def flush(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def test_store_images_closes_content_it_does_not_upload():
+    digest = hashlib.sha256(IMAGE).hexdigest()
+    existing = ImageBlob(sha256=digest, file=File(content=IMAGE), ref_count=1)
+    files = [(digest, File(content=IMAGE)) for _ in range(2)]
+
+    chat_images = asyncio.run(services.store_images(FakeSession([existing]), files))
+
+    assert [image.blob for image in chat_images] == [existing, existing]
+    assert all(file.original_content.closed for _, file in files)
+
+
+def test_sweep_skips_images_that_keep_failing(monkeypatch):
+    db = FakeSession()
+    monkeypatch.setattr(thumbnails, "Session", lambda: db)
+
+    asyncio.run(thumbnails.enqueue_pending_thumbnails())
+
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert "image_blob.thumbnail_attempts < %(thumbnail_attempts_1)s" in sql
+    assert "ORDER BY image_blob.thumbnail_attempts" in sql
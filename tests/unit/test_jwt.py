@@ -0,0 +1,50 @@
+import uuid
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from jose import jwt as jose_jwt
+
+from src.auth import jwt
+from src.auth.config import auth_config
+from src.auth.exceptions import InvalidToken
+
+
+def user():
+    return SimpleNamespace(id=uuid.uuid4(), is_admin=False, password="hash")
+
+
+def test_access_token_round_trips_without_the_password():
+    account = user()
+    token = jwt.create_access_token(user=account)
+
+    claims = jwt.decode_access_token(token)
+    data = asyncio.run(jwt.parse_jwt_user_data_optional(token))
+
+    assert set(claims) == {"sub", "iat", "exp", "is_admin"}
+    assert claims["exp"] > claims["iat"]
+    assert jose_jwt.get_unverified_header(token)["kid"] == auth_config.JWT_KEY_ID
+    assert data.user_id == account.id
+
+
+def test_expired_access_token_is_rejected():
+    token = jwt.create_access_token(
+        user=user(), expires_delta=datetime.timedelta(seconds=-1)
+    )
+
+    with pytest.raises(InvalidToken):
+        jwt.decode_access_token(token)
+
+
+def test_access_token_with_unknown_key_id_is_rejected(monkeypatch):
+    token = jwt.create_access_token(user=user())
+    previous = {auth_config.JWT_KEY_ID: auth_config.SECRET_KEY}
+    monkeypatch.setattr(auth_config, "JWT_KEY_ID", "v2")
+    monkeypatch.setattr(auth_config, "SECRET_KEY", "rotated")
+
+    with pytest.raises(InvalidToken):
+        jwt.decode_access_token(token)
+
+    monkeypatch.setattr(auth_config, "JWT_PREVIOUS_KEYS", previous)
+    assert jwt.decode_access_token(token)["sub"]
@@ -0,0 +1,60 @@
+import json
+import datetime
+
+from langchain_core.messages import SystemMessage, message_to_dict
+
+from src.chat import context
+from src.chat.models import ChatSummary
+from src.chat.prompts import SYSTEM_PROMPTS, get_system_prompt
+
+
+def prefix(messages) -> bytes:
+    return json.dumps(message_to_dict(messages[0]), sort_keys=True).encode()
+
+
+def test_system_prefix_is_byte_identical_across_turns():
+    start = datetime.datetime(2026, 1, 1)
+    entries = [("assistant", "Hello! How can I help?", start)]
+    system_prompt = get_system_prompt()
+
+    prefixes = []
+    for turn in range(1, 6):
+        created_at = start + datetime.timedelta(minutes=turn)
+        entries.append(("user", f"question {turn}", created_at))
+        entries.append(("assistant", f"answer {turn}", created_at))
+        # a running summary appears after a few turns and must not move the prefix
+        summary = (
+            ChatSummary(summary="earlier turns", summarized_until=start)
+            if turn > 2
+            else None
+        )
+
+        messages, _ = context.build_context_window(
+            entries, system_prompt=system_prompt, summary=summary, budget=200
+        )
+        prefixes.append(prefix(messages))
+
+    assert len(set(prefixes)) == 1
+    assert json.loads(prefixes[0])["data"]["content"] == system_prompt
+
+
+def test_stored_system_prompts_are_not_replayed():
+    start = datetime.datetime(2026, 1, 1)
+    entries = [
+        ("system", "an older prompt", start),
+        ("assistant", "Hello!", start),
+        ("system", "an older prompt", start),
+        ("user", "hi", start),
+    ]
+
+    messages, _ = context.build_context_window(
+        entries, system_prompt=get_system_prompt(), budget=10_000
+    )
+
+    system_messages = [m for m in messages if isinstance(m, SystemMessage)]
+    assert [m.content for m in system_messages] == [get_system_prompt()]
+
+
+def test_unknown_prompt_version_falls_back_to_current():
+    assert get_system_prompt("no-such-version") == get_system_prompt()
+    assert get_system_prompt() in SYSTEM_PROMPTS.values()
@@ -0,0 +1,129 @@
+import asyncio
+import ipaddress
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError
+
+from src import redis, rate_limit
+from src.auth import dependencies
+from src.rate_limit import RateLimiter, client_address, take_token
+
+
+class DownRedis:
+    """Client whose scripts fail as if the server were unreachable."""
+
+    def register_script(self, script):
+        return DownScript(self)
+
+
+class DownScript:
+    def __init__(self, client):
+        self.registered_client = client
+
+    async def __call__(self, keys, args):
+        raise ConnectionError("connection refused")
+
+
+def test_bucket_refills_over_time():
+    bucket, retry_after = take_token(None, now=0.0, capacity=2, refill=1.0)
+    bucket, retry_after = take_token(bucket, now=0.0, capacity=2, refill=1.0)
+    assert retry_after == 0
+
+    bucket, retry_after = take_token(bucket, now=0.25, capacity=2, refill=1.0)
+    assert retry_after == pytest.approx(0.75)
+
+    bucket, retry_after = take_token(bucket, now=1.0, capacity=2, refill=1.0)
+    assert retry_after == 0
+
+
+def test_exhausted_bucket_returns_429_with_retry_after():
+    limiter = RateLimiter("test-route", capacity=2, refill=0.1, max_local_buckets=10)
+
+    async def limit(request: Request, user: str = "alice"):
+        await limiter.check(request, user)
+
+    app = FastAPI()
+
+    @app.get("/chat", dependencies=[Depends(limit)])
+    async def chat():
+        return {}
+
+    @app.get("/other", dependencies=[Depends(limit)])
+    async def other():
+        return {}
+
+    client = TestClient(app)
+    statuses = [client.get("/chat").status_code for _ in range(3)]
+    rejected = client.get("/chat")
+
+    assert statuses == [200, 200, 429]
+    assert rejected.headers["Retry-After"] == "10"
+    # buckets are per route and per user
+    assert client.get("/other").status_code == 200
+    assert client.get("/chat", params={"user": "bob"}).status_code == 200
+
+
+def test_rate_limiter_falls_back_in_process_when_redis_is_down(monkeypatch):
+    monkeypatch.setattr(redis, "redis_client", DownRedis())
+    limiter = RateLimiter("test-down", capacity=1, refill=0.1, max_local_buckets=10)
+
+    async def hits():
+        return [await limiter.hit("alice") for _ in range(2)]
+
+    first, second = asyncio.run(hits())
+
+    assert first == 0
+    assert second > 0
+    assert limiter.stats()["errors"] == 2
+
+
+def request_from(peer: str, forwarded_for: str | None = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+def test_client_address_believes_only_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(
+        rate_limit, "_trusted_proxies", [ipaddress.ip_network("10.0.0.0/8")]
+    )
+
+    assert client_address(request_from("10.0.0.2", "1.2.3.4, 10.0.0.1")) == "1.2.3.4"
+    assert client_address(request_from("5.6.7.8", "1.2.3.4")) == "5.6.7.8"
+    assert client_address(request_from("10.0.0.2")) == "10.0.0.2"
+
+
+def test_auth_buckets_are_per_account_not_per_frontend(monkeypatch):
+    monkeypatch.setattr(
+        dependencies,
+        "rate_limiter",
+        RateLimiter("test-auth", capacity=1, refill=0.01, max_local_buckets=10),
+    )
+    app = FastAPI()
+
+    @app.post("/users/tokens")
+    async def login(auth_data=Depends(dependencies.rate_limit_login)):
+        return {}
+
+    @app.put(
+        "/users/tokens", dependencies=[Depends(dependencies.rate_limit_refresh_token)]
+    )
+    async def refresh():
+        return {}
+
+    client = TestClient(app)
+
+    def sign_in(email):
+        return client.post(
+            "/users/tokens", json={"email": email, "password": "Secret123!"}
+        ).status_code
+
+    def refresh_with(token):
+        client.cookies.set("refreshToken", token)
+        return client.put("/users/tokens").status_code
+
+    assert [sign_in("a@example.com"), sign_in("a@example.com")] == [200, 429]
+    assert sign_in("b@example.com") == 200
+    assert [refresh_with("token-a"), refresh_with("token-a")] == [200, 429]
+    assert refresh_with("token-b") == 200
@@ -0,0 +1,72 @@
+import datetime
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.chat import context
+
+
+def exchange(call_id: str, output: str):
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "exa_search", "args": {"q": "x"}, "id": call_id}],
+        ),
+        ToolMessage(output, tool_call_id=call_id),
+    ]
+
+
+def history():
+    first = datetime.datetime(2026, 1, 1, 12, 0)
+    second = first + datetime.timedelta(minutes=1)
+    entries = [
+        ("user", "market size?", first),
+        ("assistant", "it is large", first),
+        ("user", "and growth?", second),
+        ("assistant", "it is fast", second),
+    ]
+    return entries, {
+        first: exchange("old", "a" * 50),
+        second: exchange("new", "b" * 50),
+    }
+
+
+def test_tool_exchanges_are_replayed_before_their_answer():
+    entries, exchanges = history()
+
+    messages, _ = context.build_context_window(
+        entries,
+        system_prompt="prompt",
+        tool_exchanges=exchanges,
+        tool_budget=1000,
+    )
+
+    assert [type(message) for message in messages[1:]] == [
+        HumanMessage,
+        AIMessage,
+        ToolMessage,
+        AIMessage,
+        HumanMessage,
+        AIMessage,
+        ToolMessage,
+        AIMessage,
+    ]
+    assert messages[2].tool_calls[0]["id"] == "old"
+    assert messages[3].tool_call_id == "old"
+
+
+def test_tool_budget_keeps_newest_exchanges_whole():
+    entries, exchanges = history()
+
+    messages, _ = context.build_context_window(
+        entries,
+        system_prompt="prompt",
+        tool_exchanges=exchanges,
+        tool_budget=100,
+    )
+
+    tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in tool_messages] == ["new"]
+    assert not any(
+        isinstance(m, AIMessage) and m.tool_calls and m.tool_calls[0]["id"] == "old"
+        for m in messages
+    )